@@ -2,6 +2,7 @@ import os
 import re
 import sys
 import importlib.util
+import multiprocessing
 
 class Application():
     def __init__(self, py_file: str, resources_folder: str, app_folder: str):
@@ -34,6 +35,8 @@ class Application():
         return latest_version
     
 if __name__ == '__main__':
+    # Lets the rule process pool start its workers from the .exe
+    multiprocessing.freeze_support()
     Application(
         py_file = 'UI.py',
         resources_folder = 'resources',
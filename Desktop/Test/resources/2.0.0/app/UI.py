@@ -621,7 +621,8 @@ class ValidationFrame(BaseFrame):
     def run_validation(self) -> None:
         self.set_ui_state(False)
         try:
-            api_client = APIClient(ConfigManager(), AuthManager(ConfigManager()))
+            config = ConfigManager()
+            api_client = APIClient(config, AuthManager(config))
             metadata, zfzrs_data, hilucs1_data, hilucs2_data, hilucs3_data = (
                 api_client.get_metadata(category=self.validation_type)
             )
@@ -634,6 +635,9 @@ class ValidationFrame(BaseFrame):
                 hilucs1=hilucs1_data,
                 hilucs2=hilucs2_data,
                 hilucs3=hilucs3_data,
+                max_workers=config.config.getint('VALIDATOR', 'workers', fallback=0),
+                use_processes=config.config.getboolean('VALIDATOR', 'processes', fallback=False),
+                evict_layers=config.config.getboolean('VALIDATOR', 'evict_layers', fallback=False),
             )
             
             validation_passed = validator.validate()
@@ -0,0 +1,91 @@
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from .layers import GeoPackage
+
+# filetype never looks further than the first 8192 bytes of a file
+HEADER_SIZE = 8192
+
+class ArchiveIndex:
+    """Reads the central directory of the archive once and shares it with every rule."""
+
+    def __init__(self, zip_path: str, workers: int = 0):
+        self.zip_path = zip_path
+        # 0 reads the members one after another, otherwise the number of threads reading them
+        self.workers = workers
+        # Rule 1 and rule 2 report on these instead of checking the file again
+        self.exists = os.path.exists(zip_path)
+        self.is_zip = zipfile.is_zipfile(zip_path)
+        # The handle stays open so the members can be read without opening the archive again
+        self._zip_file: Optional[zipfile.ZipFile] = zipfile.ZipFile(zip_path, mode='r') if self.is_zip else None
+
+        infos = self._zip_file.infolist() if self._zip_file else []
+
+        # The names of every member, as a list for the order and as a set for the lookups
+        self.file_list: List[str] = [info.filename for info in infos]
+        self.names = set(self.file_list)
+
+        # To get the main directory
+        self.main_directory = list(filter(None, dict.fromkeys(name.split('/')[0] for name in self.file_list)))
+        # The subfolders of the main directory
+        self.folder_list = list(filter(None, dict.fromkeys(name.split('/')[1] for name in self.file_list)))
+        # The paths of the files inside the subfolders
+        self.fisiere_list = list(filter(None, dict.fromkeys(name.split('/', 2)[-1] for name in self.file_list)))
+        self.avize_list = [item for item in self.fisiere_list if item.startswith("4_")]
+
+        # The names of the pdfs, without their folders
+        self.pdfs_list = [name.split('/')[-1] for name in self.file_list if name.endswith('.pdf')]
+
+        # The full member paths of the pdfs and gpkgs, regardless of the case of the extension
+        self.pdf_files = [name for name in self.file_list if name.lower().endswith('.pdf')]
+        self.gpkg_files = [name for name in self.file_list if name.lower().endswith('.gpkg')]
+        
+        # The GeoPackages opened so far, shared by extract_data and rule 15
+        self._geopackages: Dict[str, GeoPackage] = {}
+
+    @property
+    def zip_file(self) -> Optional[zipfile.ZipFile]:
+        """The open archive, reopened if the index has been sent to another process."""
+        if self._zip_file is None and self.is_zip:
+            self._zip_file = zipfile.ZipFile(self.zip_path, mode='r')
+        return self._zip_file
+
+    def geopackage(self, member: str) -> GeoPackage:
+        """Returns the GeoPackage of a member, opened in place the first time it is asked for."""
+        if member not in self._geopackages:
+            self._geopackages[member] = GeoPackage(self.zip_path, member)
+        return self._geopackages[member]
+
+    def read_header(self, member: str, size: int = HEADER_SIZE) -> bytes:
+        """Reads only the leading bytes of a member, without extracting it."""
+        with self.zip_file.open(member) as file:
+            return file.read(size)
+
+    def read_headers(self, members: List[str], size: int = HEADER_SIZE) -> Dict[str, bytes]:
+        """Reads the leading bytes of every member, on threads if the index has workers."""
+        if self.workers <= 0 or len(members) < 2:
+            return {member: self.read_header(member, size) for member in members}
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            headers = pool.map(lambda member: self.read_header(member, size), members)
+            return dict(zip(members, headers))
+
+    def close(self) -> None:
+        """Closes the archive."""
+        if self._zip_file is not None:
+            self._zip_file.close()
+            self._zip_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __getstate__(self):
+        # The open handle can't be sent to a process pool, it is reopened there when needed
+        state = self.__dict__.copy()
+        state['_zip_file'] = None
+        return state
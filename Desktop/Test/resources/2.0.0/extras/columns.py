@@ -0,0 +1,117 @@
+import re
+import numpy as np
+import pandas as pd
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import Callable, Dict, List, Tuple, Union
+from .locks import KeyedLocks
+
+# The values the rules treat as an empty cell, besides None and NaN
+EMPTY_VALUES = ["", "NULL"]
+
+# The cedilla letters that are written instead of the comma below ones
+ROMANIAN_LETTERS = str.maketrans({
+    '\u015F': '\u0219',  # ş -> ș
+    '\u0163': '\u021B',  # ţ -> ț
+})
+
+class Vocabularies:
+    """The ZFZRS and HILUCS reference codes, built once per validation."""
+
+    def __init__(self, zfzrs: pd.DataFrame, hilucs1: pd.DataFrame, hilucs2: pd.DataFrame, hilucs3: pd.DataFrame):
+        self.zfzrs = pd.Index(zfzrs['definitie'].unique())
+        self.hilucs1 = pd.Index(hilucs1['definitie'].unique())
+        self.hilucs2 = pd.Index(hilucs2['definitie'].unique())
+        self.hilucs3 = pd.Index(hilucs3['definitie'].unique())
+
+def missing_mask(column: pd.Series) -> pd.Series:
+    """Marks the None and NaN cells of a column."""
+    if column.dtype.kind == 'M':
+        # A date column holds no None/NaN values, NaT was never counted as missing
+        return pd.Series(False, index=column.index)
+    return column.isna()
+
+def parse_date(value) -> pd.Timestamp:
+    """Parses a date written as text, NaT if it isn't text or a date."""
+    if not isinstance(value, str):
+        return pd.NaT
+    try:
+        date = pd.Timestamp(value.strip())
+    except (ValueError, OverflowError):
+        return pd.NaT
+    # datetime64 holds no time zone, the offset is dropped and the written time kept
+    return date.tz_localize(None) if date.tzinfo is not None else date
+
+def datetime_column(column: pd.Series) -> pd.Series:
+    """Parses a text column as datetime64[ms], the text that isn't a date becomes NaT. Other columns are left as they are."""
+    if column.dtype == 'O':
+        # Every distinct text is parsed once. pd.to_datetime parses to datetime64[ns], which turns the dates after 2262 into NaT
+        values = column.dropna().unique()
+        return column.map(dict(zip(values, map(parse_date, values)))).astype('datetime64[ms]')
+    return column
+
+# How a column is converted to every dtype a rule can ask for
+CONVERTERS: Dict[str, Callable[[pd.Series], pd.Series]] = {
+    'datetime64[ms]': datetime_column
+}
+
+class ColumnCache:
+    """The columns of the layers converted to another dtype, each converted once per validation and never written back."""
+
+    def __init__(self, gdf: Mapping):
+        self.gdf = gdf
+        self._columns: Dict[Tuple[str, str, str], pd.Series] = {}
+        self._locks = KeyedLocks()
+
+    def convert(self, layer: str, column: str, dtype: str) -> pd.Series:
+        """Returns the column of the layer converted to the dtype, converting it the first time it is asked for."""
+        key = (layer, column, dtype)
+        with self._locks[key]:
+            if key not in self._columns:
+                self._columns[key] = CONVERTERS[dtype](self.gdf[layer][column])
+            return self._columns[key]
+
+def null_mask(column: pd.Series) -> pd.Series:
+    """Marks the empty cells of a column: None, NaN, "" and "NULL"."""
+    return missing_mask(column) | column.isin(EMPTY_VALUES)
+
+@lru_cache(maxsize=None)
+def compiled(pattern: str) -> re.Pattern:
+    """Compiles a pattern once, however many rules and rows use it."""
+    return re.compile(pattern)
+
+def match_mask(column: pd.Series, pattern: str, strip: bool = False) -> pd.Series:
+    """Marks the cells whose text matches the pattern from its start, the same as re.match on str(value)."""
+    if column.empty:
+        # map keeps the dtype of an empty column, a number or date one has no .str
+        return pd.Series(False, index=column.index)
+    text = column.map(str)
+    if strip:
+        text = text.str.strip()
+    return text.str.match(compiled(pattern)).astype(bool)
+
+def contains_mask(text: pd.Series, part: pd.Series) -> pd.Series:
+    """Marks the rows whose text contains the part of the same row, the same as `part in text`."""
+    found = np.char.find(text.to_numpy(dtype=str), part.to_numpy(dtype=str)) >= 0
+    return pd.Series(found, index=text.index)
+
+def join_positions(column: pd.Series, reference: pd.Series, found: bool) -> List[int]:
+    """Returns the 1-based rows whose value is in the reference column when found is True, or isn't when it is False."""
+    is_float = column.dtype.kind == 'f'
+    if reference.dtype.kind == 'f':
+        # Nor is a NaN of a float reference ever found, whatever column it is looked for in
+        reference = reference.dropna()
+    # Compared as objects, the same as `in`: a date column would otherwise parse the text it is compared with
+    mask = column.astype(object).isin(reference.astype(object))
+    if is_float:
+        # A NaN read from a float column never equals another one, it was never found
+        mask &= column.notna()
+    return positions(mask if found else ~mask)
+
+def normalized_text(column: pd.Series) -> pd.Series:
+    """The stripped text of a column, with the comma below letters in place of the cedilla ones, NaN where it isn't text."""
+    return column.astype(object).str.translate(ROMANIAN_LETTERS).str.strip()
+
+def positions(mask: Union[pd.Series, np.ndarray]) -> List[int]:
+    """Returns the 1-based row numbers where the mask is True, as they are shown in the report."""
+    return (np.flatnonzero(np.asarray(mask, dtype=bool)) + 1).tolist()
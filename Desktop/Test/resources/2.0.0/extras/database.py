@@ -1,16 +1,51 @@
+import base64
 import configparser
 import json
+import os
+import time
+import threading
 import zipfile
 import tempfile
 import shutil
 from pathlib import Path
-from typing import Optional, Tuple, Dict, Any, Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Tuple, Dict, Any, Union
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
 import geopandas as gpd
 from shapely.geometry import shape 
 from packaging import version
 
+# One pool of keep-alive connections for every request of the application
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """Returns the shared HTTP session, created the first time it is asked for."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            # Enough connections for the metadata endpoints fetched at the same time
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=10)
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+        return _session
+
+# The seconds before its expiry an access token is already renewed
+TOKEN_LEEWAY = 60
+
+def token_expiry(token: str) -> Optional[float]:
+    """Reads the exp claim of a JWT locally, None if it can't be read."""
+    try:
+        payload = token.split('.')[1]
+        # The payload is base64url without its padding
+        claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+        return float(claims['exp'])
+    except Exception:
+        return None
+
 class ConfigManager:
     """
     Handles the configuration loading and management.
@@ -42,6 +77,10 @@ class ConfigManager:
 class CacheManager:
     """Manages the writing and retrieval of the access and refresh tokens"""
     
+    # The tokens of every cache file, kept in memory so the file is only read once
+    _tokens: Dict[str, Tuple[str, str]] = {}
+    _tokens_lock = threading.Lock()
+    
     def __init__(self, cache_path: Optional[str] = None):
         # The path of the version
         self.base_path = Path(__file__).resolve().parent.parent
@@ -73,23 +112,128 @@ class CacheManager:
     
     def get_tokens(self) -> Tuple[str, str]:
         """Get cached tokens."""
-        data = self._read_cache()
-        return data["access_token"], data["refresh_token"]
+        with self._tokens_lock:
+            if self.cache_path not in self._tokens:
+                data = self._read_cache()
+                self._tokens[self.cache_path] = (data["access_token"], data["refresh_token"])
+            return self._tokens[self.cache_path]
     
     def update_tokens(self, access_token: str, refresh_token: str) -> None:
-        """Update cached tokens."""
-        self._write_cache({
-            "access_token": access_token,
-            "refresh_token": refresh_token
-        })
+        """Update cached tokens, the file is only written when they changed."""
+        with self._tokens_lock:
+            if self._tokens.get(self.cache_path) == (access_token, refresh_token):
+                return
+            self._write_cache({
+                "access_token": access_token,
+                "refresh_token": refresh_token
+            })
+            self._tokens[self.cache_path] = (access_token, refresh_token)
     
     def clear_cache(self) -> None:
         """Clear the cache."""
-        self._write_cache({"access_token": "", "refresh_token": ""})
+        with self._tokens_lock:
+            self._write_cache({"access_token": "", "refresh_token": ""})
+            self._tokens[self.cache_path] = ("", "")
+
+class MetadataCache:
+    """Keeps the validation metadata on disk as Parquet files, one folder per validator version."""
+    
+    def __init__(self, config: ConfigManager, cache_dir: Optional[str] = None):
+        # The path of the version
+        self.base_path = Path(__file__).resolve().parent.parent
+        # A new version of the validator starts with an empty folder
+        folder = config.config.get('CACHE', 'folder', fallback='cache')
+        self.cache_dir = Path(cache_dir or self.base_path / folder) / config.get('VALIDATOR', 'version')
+        # How many seconds a cached table is used without asking the server if it changed
+        self.ttl = config.config.getint('CACHE', 'ttl', fallback=86400)
+        self.index_path = self.cache_dir / 'index.json'
+        self._index = self._read_index()
+    
+    def _read_index(self) -> Dict[str, Dict[str, Any]]:
+        """Read when every table was fetched and its ETag/Last-Modified."""
+        try:
+            with open(self.index_path, 'r') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+    
+    def _path(self, name: str) -> Path:
+        return self.cache_dir / f'{name}.parquet'
+    
+    def is_fresh(self, name: str) -> bool:
+        """Checks if a table is cached and younger than the ttl."""
+        entry = self._index.get(name)
+        return entry is not None and time.time() - entry['fetched_at'] < self.ttl
+    
+    def validators(self, name: str) -> Dict[str, str]:
+        """The headers that ask the server to answer 304 if the cached table hasn't changed."""
+        entry = self._index.get(name, {})
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+    
+    def load(self, name: str) -> Optional[pd.DataFrame]:
+        """Read a cached table, None if it isn't cached or can't be read."""
+        if name not in self._index:
+            return None
+        try:
+            frame = pd.read_parquet(self._path(name))
+            for column in self._index[name].get('json_columns', []):
+                # Built as objects, map would turn the ints and None of a column into floats and NaN
+                frame[column] = pd.Series([json.loads(value) for value in frame[column]], index=frame.index, dtype=object)
+            return frame
+        except Exception:
+            self._index.pop(name, None)
+            return None
+    
+    def store(self, name: str, frame: pd.DataFrame, response: requests.Response) -> None:
+        """Write a table with the validators of the response it came from."""
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # Written aside first so a table is never left half written
+            temp_path = self._path(name).with_suffix('.tmp')
+            # Parquet holds one type per column, the object columns that aren't only text are written as JSON
+            json_columns = [
+                column for column in frame.columns
+                if frame[column].dtype == 'O' and pd.api.types.infer_dtype(frame[column], skipna=True) not in ('string', 'empty')
+            ]
+            frame.assign(**{column: frame[column].map(json.dumps) for column in json_columns}).to_parquet(temp_path, index=False)
+            os.replace(temp_path, self._path(name))
+        except Exception as e:
+            # A table Parquet can't hold is fetched every time
+            print(f"Failed to cache {name}: {str(e)}")
+            self._index.pop(name, None)
+            return
+        
+        self._index[name] = {
+            'fetched_at': time.time(),
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'json_columns': json_columns
+        }
+    
+    def touch(self, name: str) -> None:
+        """Mark a cached table as checked now, after the server answered that it hasn't changed."""
+        self._index[name]['fetched_at'] = time.time()
+    
+    def save(self) -> None:
+        """Write the index of the cached tables."""
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.index_path, 'w') as f:
+                json.dump(self._index, f)
+        except OSError as e:
+            print(f"Failed to save the metadata cache: {str(e)}")
 
 class AuthManager:
     """Handles authentication and token management."""
     
+    # Keeps the requests rejected at the same time from refreshing the tokens once each
+    _refresh_lock = threading.Lock()
+    
     def __init__(self, config: ConfigManager):
         self.config = config
         self.cache = CacheManager()
@@ -97,7 +241,7 @@ class AuthManager:
     def _make_request(self, url: str, data: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> requests.Response:
         """Helper method for making HTTP requests."""
         try:
-            response = requests.post(
+            response = get_session().post(
                 url=url,
                 json=data,
                 headers=headers or {},
@@ -136,49 +280,79 @@ class AuthManager:
         try:
             access_token, refresh_token = self.cache.get_tokens()
             if access_token:
-                verify_url = self.config.get('PROVIDER', 'graphit') + self.config.get('LOGIN', 'verify')
-                try:
-                    self._make_request(verify_url, {"token": access_token})
+                # A token that isn't close to its expiry is used without asking the server
+                if self.is_valid(access_token):
                     return access_token, refresh_token
-                except:
-                    # Token might be expired, try renewing
-                    new_access_token = self.renew_token()
-                    if new_access_token:
-                        new_access_token, new_refresh_token = self.cache.get_tokens()
-                        return new_access_token, new_refresh_token
+                
+                # Token is expired or its expiry can't be read, renew_token verifies or refreshes it
+                new_access_token = self.renew_token()
+                if new_access_token:
+                    new_access_token, new_refresh_token = self.cache.get_tokens()
+                    return new_access_token, new_refresh_token
             return None
         except Exception as e:
             print(f"Auto-login failed: {str(e)}")
             return None
             
+    def is_valid(self, access_token: str) -> bool:
+        """Checks locally that the token doesn't expire within the leeway."""
+        expiry = token_expiry(access_token)
+        return expiry is not None and expiry - TOKEN_LEEWAY > time.time()
+            
     def renew_token(self) -> Optional[str]:
         """Renew access token using refresh token."""
         try:
             access_token, refresh_token = self.cache.get_tokens()
-            if not refresh_token:
-                return None
+            
+            # A token that isn't close to its expiry is used without asking the server
+            if access_token and self.is_valid(access_token):
+                return access_token
                 
             refresh_url = self.config.get('PROVIDER', 'graphit') + self.config.get('LOGIN', 'refresh')
             verify_url = self.config.get('PROVIDER', 'graphit') + self.config.get('LOGIN', 'verify')
             
-            # First try to verify current access token
-            try:
-                self._make_request(verify_url, {"token": access_token})
-                return access_token
-            except:
-                pass
+            # A token whose expiry can't be read is verified by the server
+            if access_token and token_expiry(access_token) is None:
+                try:
+                    self._make_request(verify_url, {"token": access_token})
+                    return access_token
+                except:
+                    pass
+            
+            if not refresh_token:
+                return None
                 
             # If verification fails, try refreshing
-            refresh_data = {"refresh": refresh_token}
-            response = self._make_request(refresh_url, refresh_data)
-            
-            new_tokens = response.json()
-            self.cache.update_tokens(new_tokens["access"], new_tokens["refresh"])
-            return new_tokens["access"]
+            return self._refresh(refresh_url, refresh_token)
             
         except Exception as e:
             print(f"Token renewal failed: {str(e)}")
             return None
+    
+    def refresh(self, rejected_token: str) -> Optional[str]:
+        """Refresh a token the server rejected before its local expiry, unless another request already replaced it."""
+        try:
+            with AuthManager._refresh_lock:
+                access_token, refresh_token = self.cache.get_tokens()
+                if access_token and access_token != rejected_token:
+                    return access_token
+                if not refresh_token:
+                    return None
+                
+                refresh_url = self.config.get('PROVIDER', 'graphit') + self.config.get('LOGIN', 'refresh')
+                return self._refresh(refresh_url, refresh_token)
+            
+        except Exception as e:
+            print(f"Token refresh failed: {str(e)}")
+            return None
+    
+    def _refresh(self, refresh_url: str, refresh_token: str) -> str:
+        """Exchange the refresh token for new tokens and cache them."""
+        response = self._make_request(refresh_url, {"refresh": refresh_token})
+        
+        new_tokens = response.json()
+        self.cache.update_tokens(new_tokens["access"], new_tokens["refresh"])
+        return new_tokens["access"]
 
 class APIClient:
     """Handles API communication and data retrieval."""
@@ -188,19 +362,34 @@ class APIClient:
         self.auth = auth
         self.base_url = self.config.get('PROVIDER', 'graphit')
         
-    def _get_authorized(self, url: str) -> requests.Response:
-        """Make authorized GET request."""
+    def _token(self) -> str:
+        """Get a valid access token."""
         token = self.auth.renew_token()
         if not token:
             raise PermissionError("Not authenticated")
-            
-        response = requests.get(
+        return token
+        
+    def _get_authorized(self, url: str, headers: Optional[Dict[str, str]] = None, token: Optional[str] = None) -> requests.Response:
+        """Make authorized GET request, the token is checked first unless one is given."""
+        token = token or self._token()
+        response = self._get(url, headers, token)
+        
+        if response.status_code == 401:
+            # The token was revoked, or the clocks differ by more than the leeway, it is refreshed and the request tried once more
+            token = self.auth.refresh(token)
+            if not token:
+                raise PermissionError("Not authenticated")
+            response = self._get(url, headers, token)
+        
+        response.raise_for_status()
+        return response
+    
+    def _get(self, url: str, headers: Optional[Dict[str, str]], token: str) -> requests.Response:
+        return get_session().get(
             url=url,
-            headers={'Authorization': f'JWT {token}'},
+            headers={**(headers or {}), 'Authorization': f'JWT {token}'},
             timeout=15
         )
-        response.raise_for_status()
-        return response
         
     def get_metadata(self, category: int) -> Tuple[pd.DataFrame, ...]:
         """Get validation metadata and reference data."""
@@ -209,20 +398,30 @@ class APIClient:
             rules_url = (self.config.get('PROVIDER', 'graphit') + 
                         self.config.get('METADATA', 'rules').replace('V', version).replace('C', str(category)))
             
-            # Define all endpoints to fetch
+            # Define all endpoints to fetch, the rules are cached for every category
             endpoints = {
-                'rules': rules_url,
+                f'rules_{category}': rules_url,
                 'zfzrs': self.base_url + self.config.get('METADATA', 'zfzrs'),
                 'hilucs1': self.base_url + self.config.get('METADATA', 'hilucs1'),
                 'hilucs2': self.base_url + self.config.get('METADATA', 'hilucs2'),
                 'hilucs3': self.base_url + self.config.get('METADATA', 'hilucs3')
             }
             
-            # Fetch all data in parallel (could be optimized further with async)
-            responses = {name: self._get_authorized(url).json() for name, url in endpoints.items()}
+            cache = MetadataCache(self.config)
+            tokens = []
+            token_lock = threading.Lock()
             
-            # Convert all responses to DataFrames
-            dataframes = tuple(pd.json_normalize(responses[name]) for name in ['rules', 'zfzrs', 'hilucs1', 'hilucs2', 'hilucs3'])
+            def token() -> str:
+                # Checked once for the whole batch, by the first table the cache can't answer
+                with token_lock:
+                    if not tokens:
+                        tokens.append(self._token())
+                    return tokens[0]
+            
+            # Fetch all data in parallel, over the connections of the shared session
+            with ThreadPoolExecutor(max_workers=len(endpoints)) as pool:
+                dataframes = tuple(pool.map(lambda endpoint: self._get_table(cache, *endpoint, token), endpoints.items()))
+            cache.save()
             
             return dataframes
             
@@ -230,6 +429,21 @@ class APIClient:
             print(f"Failed to fetch metadata: {str(e)}")
             raise
             
+    def _get_table(self, cache: MetadataCache, name: str, url: str, token: Callable[[], str]) -> pd.DataFrame:
+        """Get a metadata table from the cache, asking the server only once the ttl has passed."""
+        cached = cache.load(name)
+        if cached is not None and cache.is_fresh(name):
+            return cached
+        
+        response = self._get_authorized(url, headers=cache.validators(name) if cached is not None else None, token=token())
+        if response.status_code == 304 and cached is not None:
+            cache.touch(name)
+            return cached
+        
+        frame = pd.json_normalize(response.json())
+        cache.store(name, frame, response)
+        return frame
+            
     def get_geodata(self, siruta: str) -> Optional[gpd.GeoDataFrame]:
         """Get geographic data for a SIRUTA code."""
         try:
@@ -0,0 +1,67 @@
+import numpy as np
+import geopandas as gpd
+import shapely
+from shapely.geometry.base import BaseGeometry
+from collections.abc import Mapping
+from typing import Dict
+from .columns import positions
+from .locks import KeyedLocks
+
+def require_geometries(geometries: np.ndarray) -> None:
+    """Raises an error naming the 1-based rows that have no geometry, the rules report it instead of a result."""
+    missing = shapely.is_missing(geometries)
+    if missing.any():
+        raise ValueError(f"Missing geometries on rows {positions(missing)}")
+
+def within_mask(geometries: np.ndarray, container: BaseGeometry) -> np.ndarray:
+    """Marks the geometries within the container, which is prepared once for all of them."""
+    # A prepared geometry only speeds up the predicates it is the first argument of
+    shapely.prepare(container)
+    return shapely.contains(container, geometries)
+
+def aligned_contains_mask(containers: gpd.GeoSeries, geometries: gpd.GeoSeries) -> np.ndarray:
+    """Marks the rows whose container contains the geometry of the same index, a row missing from either side isn't contained.
+
+    The same rows as `containers.contains(geometries)` of geopandas, with the containers prepared first.
+    """
+    containers, geometries = containers.align(geometries)
+    containers, geometries = np.asarray(containers.values), np.asarray(geometries.values)
+    shapely.prepare(containers)
+    return shapely.contains(containers, geometries)
+
+def union(geometries: np.ndarray) -> BaseGeometry:
+    """Unions the geometries, through the much faster coverage union when they don't overlap."""
+    geometries = geometries[~shapely.is_missing(geometries)]
+    if len(geometries) == 0:
+        return shapely.union_all(geometries)
+
+    try:
+        merged = shapely.coverage_union_all(geometries)
+        # Polygons that overlap or edges that don't match leave parts that aren't dissolved, an invalid result
+        if merged.is_valid:
+            return merged
+    except shapely.errors.GEOSException:
+        pass
+
+    # Not a coverage, the cascaded union of GEOS reduces the geometries as a tree
+    return shapely.union_all(geometries)
+
+class UnionCache(Mapping):
+    """The union of the geometries of every layer, computed the first time a rule asks for it."""
+
+    def __init__(self, gdf: Mapping):
+        self.gdf = gdf
+        self._unions: Dict[str, BaseGeometry] = {}
+        self._locks = KeyedLocks()
+
+    def __getitem__(self, layer: str) -> BaseGeometry:
+        with self._locks[layer]:
+            if layer not in self._unions:
+                self._unions[layer] = union(self.gdf[layer]['geometry'].values)
+            return self._unions[layer]
+
+    def __iter__(self):
+        return iter(self._unions)
+
+    def __len__(self) -> int:
+        return len(self._unions)
@@ -0,0 +1,142 @@
+import os
+import fiona
+import pyogrio
+import geopandas as gpd
+from pathlib import Path
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+from .locks import KeyedLocks, Lock
+
+class GeoPackage:
+    """Reads a GeoPackage in place, inside the archive, through the GDAL /vsizip/ filesystem."""
+
+    def __init__(self, zip_path: str, member: str):
+        self.member = member
+        # The braces let GDAL find the archive whatever its extension is
+        self.path = f"/vsizip/{{{Path(zip_path).resolve().as_posix()}}}/{member}"
+        self._layers: Optional[List[str]] = None
+        self._driver: Optional[str] = None
+
+    def open(self) -> None:
+        """Opens the dataset once and caches its layers and driver."""
+        if self._layers is not None:
+            return
+        self._layers = fiona.listlayers(self.path)
+        with fiona.open(self.path) as src:
+            self._driver = src.driver
+
+    @property
+    def layers(self) -> List[str]:
+        """The names of the layers of the GeoPackage."""
+        self.open()
+        return self._layers
+
+    @property
+    def driver(self) -> str:
+        """The GDAL driver that opened the GeoPackage."""
+        self.open()
+        return self._driver
+
+    def read_layer(self, layer: str, columns: Optional[Set[str]] = None) -> gpd.GeoDataFrame:
+        """Reads a layer through the Arrow interface of pyogrio, with only the columns asked for (all if None)."""
+        # pyogrio only opens datasets from a path, so no dataset is held open between reads. Reopening is cheap,
+        # GDAL keeps the directory of the archive cached for /vsizip/ and every layer is only read once by LayerDict
+        return pyogrio.read_dataframe(
+            self.path,
+            layer=layer,
+            columns=None if columns is None else sorted(columns),
+            use_arrow=True
+        )
+
+    def read_layers(self, projection: Dict[str, Optional[Set[str]]]) -> Dict[str, gpd.GeoDataFrame]:
+        """Reads the layers of the projection at the same time, each with its own columns."""
+        layers = [layer for layer in self.layers if layer in projection]
+        if not layers:
+            return {}
+
+        with ThreadPoolExecutor(max_workers=min(len(layers), os.cpu_count() or 1)) as pool:
+            frames = pool.map(lambda layer: self.read_layer(layer, projection[layer]), layers)
+            return dict(zip(layers, frames))
+
+class LayerDict(Mapping):
+    """The layers of a GeoPackage as a dict, each layer is read the first time it is asked for."""
+
+    def __init__(self, geopackage: GeoPackage, projection: Optional[Dict[str, Optional[Set[str]]]] = None):
+        self.geopackage = geopackage
+        # The columns read for every layer, a layer missing from it is read whole
+        self.projection = projection or {}
+        # The names are known up front, rules 16 and 17 only need them
+        self._names = list(geopackage.layers)
+        self._loaded: Dict[str, gpd.GeoDataFrame] = {}
+        # How many of the remaining rules read every layer, only kept when layers are evicted
+        self._readers: Dict[str, int] = {}
+        self._locks = KeyedLocks()
+        self._readers_lock = Lock()
+
+    def __getitem__(self, layer: str) -> gpd.GeoDataFrame:
+        if layer not in self._names:
+            raise KeyError(layer)
+
+        with self._locks[layer]:
+            if layer not in self._loaded:
+                self._loaded[layer] = self.geopackage.read_layer(layer, self.projection.get(layer))
+            return self._loaded[layer]
+
+    def __contains__(self, layer) -> bool:
+        return layer in self._names
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def prefetch(self) -> None:
+        """Reads every layer of the projection that isn't loaded yet, at the same time."""
+        projection = {layer: columns for layer, columns in self.projection.items() if layer not in self._loaded}
+        for layer, frame in self.geopackage.read_layers(projection).items():
+            with self._locks[layer]:
+                self._loaded.setdefault(layer, frame)
+
+    def retain(self, readers: Dict[str, int]) -> None:
+        """Sets how many rules read every layer, a layer is evicted once all of them released it."""
+        with self._readers_lock:
+            self._readers = dict(readers)
+
+    def release(self, layers: Iterable[str]) -> None:
+        """Marks the layers as no longer needed by a rule, evicting the ones no remaining rule reads."""
+        with self._readers_lock:
+            for layer in layers:
+                if layer not in self._readers:
+                    continue
+                self._readers[layer] -= 1
+                if self._readers[layer] <= 0:
+                    del self._readers[layer]
+                    # Under the lock of the layer, a rule that is still reading it gets it whole
+                    with self._locks[layer]:
+                        self._loaded.pop(layer, None)
+
+    def subset(self, projection: Dict[str, Optional[Set[str]]]) -> Dict[str, gpd.GeoDataFrame]:
+        """Returns the layers of a projection with only its columns, what a rule sent to another process reads.
+
+        A layer mapped to an empty set keeps its geometry, a layer with columns only keeps the geometry if it is named.
+        """
+        frames = {}
+        for layer, columns in projection.items():
+            if layer not in self:
+                continue
+            frame = self[layer]
+            if columns is None:
+                frames[layer] = frame
+            else:
+                wanted = columns or {'geometry'}
+                frames[layer] = frame[[column for column in frame.columns if column in wanted]]
+        return frames
+
+    def __getstate__(self):
+        # The loaded layers aren't sent to a process pool, the other process reads what it needs
+        state = self.__dict__.copy()
+        state['_loaded'] = {}
+        state['_readers'] = {}
+        return state
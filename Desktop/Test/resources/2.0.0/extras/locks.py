@@ -0,0 +1,41 @@
+import threading
+from typing import Dict, Hashable
+
+class Lock:
+    """A lock that can be sent to a process pool, the other process gets a lock of its own."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self._lock.__enter__()
+
+    def __exit__(self, *exc_info):
+        return self._lock.__exit__(*exc_info)
+
+    def __getstate__(self):
+        return {}
+
+    def __setstate__(self, state):
+        self.__init__()
+
+class KeyedLocks:
+    """A lock for every key, made the first time it is asked for.
+
+    It keeps two threads from computing or reading the same entry of a cache at the same time.
+    Sent to a process pool, the other process starts with no locks.
+    """
+
+    def __init__(self):
+        self._locks: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key: Hashable) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def __getstate__(self):
+        return {}
+
+    def __setstate__(self, state):
+        self.__init__()
@@ -1,28 +1,33 @@
-import os
-import re
 import numpy as np
 import pandas as pd
+import shapely
 from shapely.geometry import shape
 from pyproj import Geod
-import zipfile
-import tempfile
 from datetime import datetime
 import filetype
-import fiona
 from .writer import ReportWriter
+from .columns import ROMANIAN_LETTERS, compiled, contains_mask, join_positions, match_mask, missing_mask, normalized_text, null_mask, positions
+from .geometry import aligned_contains_mask, require_geometries, within_mask
 from .database import APIClient, AuthManager, ConfigManager
 # 1 - PUG | 2 - PUD | 3 - PUZ | 4 - PATJ
 
+# The formats checked by rule 23
+DATE_PATTERN = r'^\d{4}-(0[1-9]|1[0-2])-(0[1-9]|[12][0-9]|3[01])(?: 00:00:00(?:\+00:00)?)?$'
+DATE_2_PATTERN = r'^\d{1,6}\/(0[1-9]|[1-2][0-9]|3[0-1])\.(0[1-9]|1[0-2])\.\d{4}$'
+DECIMALS_PATTERN = r'^\d*\.\d{1,2}$'
+HCL_PATTERN = r'^\d{1,6}$'
+
 class CategoryOne:
-    def __init__(self, validation_type, zip_path):
+    def __init__(self, validation_type, zip_path, archive):
         self.validation_type = validation_type 
         self.zip_path = zip_path
+        self.archive = archive
     
     # Rule 1 - Checks if the file exists
     def rule_1(self, rule):
         if int(self.validation_type) in [1, 2, 3, 4]:
             try:
-                if not os.path.exists(self.zip_path):
+                if not self.archive.exists:
                     ReportWriter.write_fail(rule=rule, verify=self.zip_path)
                     return int(rule['tip_alerta_id']) != 1  # False only if Blocker
                 
@@ -37,7 +42,7 @@ class CategoryOne:
     def rule_2(self, rule):
         if int(self.validation_type) in [1, 2, 3, 4]:
             try:
-                if not zipfile.is_zipfile(self.zip_path):
+                if not self.archive.is_zip:
                     ReportWriter.write_fail(rule=rule, verify=self.zip_path)
                     return int(rule['tip_alerta_id']) != 1  # False only if Blocker
                 
@@ -49,15 +54,16 @@ class CategoryOne:
                 return int(rule['tip_alerta_id']) != 1  # False only if Blocker
     
 class CategoryTwo:
-    def __init__(self, validation_type, zip_path):
+    def __init__(self, validation_type, zip_path, archive):
         self.validation_type = validation_type 
         self.zip_path = zip_path
+        self.archive = archive
     
     # Checks if only one main directory exists
-    def rule_3(self, rule, main_dir):
+    def rule_3(self, rule):
         if int(self.validation_type) in [1, 2, 3, 4]:
             try:
-                if not int(rule["valoare_regula"]) == int(len(main_dir)):
+                if not int(rule["valoare_regula"]) == int(len(self.archive.main_directory)):
                     ReportWriter.write_fail(rule=rule, verify=rule["valoare_regula"])
                     return int(rule['tip_alerta_id']) != 1  # False only if Blocker
             
@@ -69,9 +75,11 @@ class CategoryTwo:
                 return int(rule['tip_alerta_id']) != 1
     
     # Checks if the name of the dir is correct
-    def rule_4(self, rule, main_dir):
+    def rule_4(self, rule):
         if int(self.validation_type) in [1, 2, 3, 4]:
             try:
+                main_dir = self.archive.main_directory
+                
                 if len(main_dir) != 1:
                     ReportWriter.write_fail(rule=rule, verify=f"Au fost gasite {len(main_dir)} directoare principale! Trebuie sa fie doar un singur director principal")
                     return int(rule['tip_alerta_id']) != 1  # False only if Blocker
@@ -80,7 +88,7 @@ class CategoryTwo:
                 directory = main_dir[0]
                 regex = rule['valoare_regula']
                 
-                if not re.match(regex, directory):
+                if not compiled(regex).match(directory):
                     ReportWriter.write_fail(rule=rule, verify=main_dir)
                     return int(rule['tip_alerta_id']) != 1 # False only if Blocker
                 
@@ -92,10 +100,10 @@ class CategoryTwo:
                 return int(rule['tip_alerta_id']) != 1
     
     # Checks if the number of subdirs is correct
-    def rule_5(self, rule, folder_list):
+    def rule_5(self, rule):
         if int(self.validation_type) in [1, 2, 3, 4]:
             try:
-                if not int(rule["valoare_regula"]) == int(len(folder_list)):
+                if not int(rule["valoare_regula"]) == int(len(self.archive.folder_list)):
                     ReportWriter.write_fail(rule=rule, verify=rule["valoare_regula"])
                     return int(rule['tip_alerta_id']) != 1 # False only if Blocker
                 
@@ -107,10 +115,10 @@ class CategoryTwo:
                 return int(rule['tip_alerta_id']) != 1 # False only if Blocker
         
     # Checks if the subdirs names are correct
-    def rule_6(self, rule, folder_list):
+    def rule_6(self, rule):
         if int(self.validation_type) in [1, 2, 3, 4]:
             try:
-                if not rule["valoare_regula"] in folder_list:
+                if not rule["valoare_regula"] in self.archive.folder_list:
                     ReportWriter.write_fail(rule=rule, verify=rule["valoare_regula"])
                     return int(rule['tip_alerta_id']) != 1 # False only if Blocker
                 
@@ -122,15 +130,15 @@ class CategoryTwo:
                 return int(rule['tip_alerta_id']) != 1 # False only if Blocker
             
     # Checks if the main dir, subdir and files have the correct structure
-    def rule_7(self, rule, main_directory, file_list):
+    def rule_7(self, rule):
         if int(self.validation_type) in [1, 2, 3, 4]:
             try:
-                main_dir = main_directory[0]
+                main_dir = self.archive.main_directory[0]
                 expected_folders = rule['valoare_regula'].split(',')
 
                 for folder in expected_folders:
                     folder_structure = f'{main_dir}/{folder}/'
-                    if folder_structure not in file_list:
+                    if folder_structure not in self.archive.names:
                         ReportWriter.write_fail(
                             rule=rule,
                             verify=f"Folder '{folder_structure}' not found in file list"
@@ -145,10 +153,10 @@ class CategoryTwo:
                 return int(rule['tip_alerta_id']) != 1 # False only if Blocker
     
     # Checks if the number of gpkg is correct
-    def rule_8(self, rule, gpkg_list):
+    def rule_8(self, rule):
         if int(self.validation_type) in [1, 2, 3, 4]:
             try:
-                if not int(rule["valoare_regula"]) == int(len(gpkg_list)):
+                if not int(rule["valoare_regula"]) == int(len(self.archive.gpkg_files)):
                     ReportWriter.write_fail(rule=rule, verify=rule["valoare_regula"])
                     return int(rule['tip_alerta_id']) != 1 # False only if Blocker
                 
@@ -160,9 +168,12 @@ class CategoryTwo:
                 return int(rule['tip_alerta_id']) != 1 # False only if Blocker
     
     # Checks if the gpkg has the correct name structure  
-    def rule_9(self, rule, gpkg_list):
+    def rule_9(self, rule):
         if int(self.validation_type) in [1, 2, 3, 4]:
             try:
+                # The regex is matched against the name of the gpkg, without its folders
+                gpkg_list = [name.split('/')[-1] for name in self.archive.gpkg_files]
+                
                 if len(gpkg_list) != 1:
                     ReportWriter.write_fail(rule=rule, verify=f"Au fost gasite {len(gpkg_list)} fisiere gpkg! Trebuie sa fie doar un singur fisier gpkg!")
                     return int(rule['tip_alerta_id']) != 1  # False only if Blocker
@@ -170,7 +181,7 @@ class CategoryTwo:
                 gpkg = gpkg_list[0]
                 regex = rule['valoare_regula']
                 
-                if not re.match(regex, gpkg):
+                if not compiled(regex).match(gpkg):
                     ReportWriter.write_fail(rule=rule, verify=gpkg)
                     return int(rule['tip_alerta_id']) != 1
                 
@@ -182,10 +193,10 @@ class CategoryTwo:
                 return int(rule['tip_alerta_id']) != 1 # False only if Blocker
     
     # Checks if the number of pdfs is correct (w/o avize)
-    def rule_10(self, rule, pdfs_list, avize_list):
+    def rule_10(self, rule):
         if int(self.validation_type) in [1, 2, 3, 4]:
             try:
-                if not int(rule["valoare_regula"]) >= int(len(pdfs_list)) - int(len(avize_list)):
+                if not int(rule["valoare_regula"]) >= int(len(self.archive.pdfs_list)) - int(len(self.archive.avize_list)):
                     ReportWriter.write_fail(rule=rule, verify=rule["valoare_regula"])
                     return int(rule['tip_alerta_id']) != 1 # False only if Blocker
                 
@@ -197,10 +208,10 @@ class CategoryTwo:
                 return int(rule['tip_alerta_id']) != 1 # False only if Blocker
       
     # Checks if the pdf files names are correct   
-    def rule_11(self, rule, pdfs_list):
+    def rule_11(self, rule):
         if int(self.validation_type) in [1, 2, 3, 4]:
             try:
-                if not rule["valoare_regula"] in pdfs_list:
+                if not rule["valoare_regula"] in self.archive.pdfs_list:
                     ReportWriter.write_fail(rule=rule, verify=rule["valoare_regula"])
                     return int(rule['tip_alerta_id']) != 1 # False only if Blocker
                 
@@ -212,10 +223,10 @@ class CategoryTwo:
                 return int(rule['tip_alerta_id']) != 1 # False only if Blocker
     
     # Checks if the number of pdfs (avize) is correct
-    def rule_12(self, rule, avize_list):
+    def rule_12(self, rule):
         if int(self.validation_type) in [1, 2, 3, 4]:
             try:
-                if not int(rule["valoare_regula"]) >= int(len(avize_list)):
+                if not int(rule["valoare_regula"]) >= int(len(self.archive.avize_list)):
                     ReportWriter.write_fail(rule=rule)
                     return int(rule['tip_alerta_id']) != 1 # False only if Blocker
                 
@@ -227,15 +238,11 @@ class CategoryTwo:
                 return int(rule['tip_alerta_id']) != 1 # False only if Blocker
     
     # Checks if the name of the pdfs (avize) is correct
-    def rule_13(self, rule, avize_list):
+    def rule_13(self, rule):
         if int(self.validation_type) in [1, 2, 3, 4]:
             try:
-                regex = rule['valoare_regula']
-                avize_failed = []
-                
-                for aviz in avize_list:
-                    if not re.match(r''+regex+'', aviz):
-                        avize_failed.append(aviz)
+                pattern = compiled(rule['valoare_regula'])
+                avize_failed = [aviz for aviz in self.archive.avize_list if not pattern.match(aviz)]
                         
                 if not len(avize_failed) == 0:
                     ReportWriter.write_fail(rule=rule, verify=avize_failed)
@@ -249,9 +256,10 @@ class CategoryTwo:
                 return int(rule['tip_alerta_id']) != 1 # False only if Blocker
             
 class CategoryThree:
-    def __init__(self, validation_type, zip_path):
+    def __init__(self, validation_type, zip_path, archive):
         self.validation_type = validation_type 
         self.zip_path = zip_path
+        self.archive = archive
     
     # Checks if the pdfs files are valid 
     def rule_14(self, rule):
@@ -260,29 +268,25 @@ class CategoryThree:
                 rule_value = []
                 pdf_fail = []
                 
-                with tempfile.TemporaryDirectory() as temp_dir:
-                    with zipfile.ZipFile(self.zip_path, 'r') as zip_archive:
-                        pdf_files = [pdf for pdf in zip_archive.namelist() if pdf.lower().endswith('.pdf')]
-                        zip_archive.extractall(temp_dir, members=pdf_files)
-                        
-                        for pdf_file in pdf_files:
-                            extract_path = os.path.join(temp_dir, pdf_file)
-                            
-                            kind = filetype.guess(extract_path)
-                            if kind == None:
-                                pdf_fail.append(pdf_file)
-                                rule_value.append(False)
-                            
-                            elif kind.extension != rule["valoare_regula"]:
-                                pdf_fail.append(pdf_file)
-                                rule_value.append(False)
-                            
-                            elif kind.extension == rule["valoare_regula"]:
-                                rule_value.append(True)
-                            
-                            else:
-                                pdf_fail.append(pdf_file)
-                                rule_value.append(False)
+                # Only the leading bytes are needed to recognize the type of the file
+                headers = self.archive.read_headers(self.archive.pdf_files)
+                
+                for pdf_file, header in headers.items():
+                    kind = filetype.guess(header)
+                    if kind == None:
+                        pdf_fail.append(pdf_file)
+                        rule_value.append(False)
+                    
+                    elif kind.extension != rule["valoare_regula"]:
+                        pdf_fail.append(pdf_file)
+                        rule_value.append(False)
+                    
+                    elif kind.extension == rule["valoare_regula"]:
+                        rule_value.append(True)
+                    
+                    else:
+                        pdf_fail.append(pdf_file)
+                        rule_value.append(False)
                 
                 pdf_fail_list = [pdf.split('/')[-1] for pdf in pdf_fail]
                 pdf_fail_list = '\n'.join(pdf_fail_list) 
@@ -304,28 +308,23 @@ class CategoryThree:
             try:
                 rule_value = []
                     
-                with tempfile.TemporaryDirectory() as temp_dir:
-                    with zipfile.ZipFile(self.zip_path, 'r') as zip_archive:
-                        gpkg_files = [gpkg for gpkg in zip_archive.namelist() if gpkg.lower().endswith('.gpkg')]
-                        zip_archive.extractall(temp_dir, members=gpkg_files)
-                        
-                        for gpkg_file in gpkg_files:
-                            extract_path = os.path.join(temp_dir, gpkg_file)
-                            
-                            with fiona.open(extract_path) as src:
-                                file_format = src.driver.lower()
-                                
-                                if file_format == None:
-                                    rule_value.append(False)
-                            
-                                elif file_format != rule["valoare_regula"]:
-                                    rule_value.append(False)
-                            
-                                elif file_format == rule['valoare_regula']:
-                                    rule_value.append(True)
-                            
-                                else:
-                                    rule_value.append(False)
+                gpkg_files = self.archive.gpkg_files
+                
+                for gpkg_file in gpkg_files:
+                    # The GeoPackage is opened inside the archive, once for extract_data and this rule
+                    file_format = self.archive.geopackage(gpkg_file).driver.lower()
+                    
+                    if file_format == None:
+                        rule_value.append(False)
+                
+                    elif file_format != rule["valoare_regula"]:
+                        rule_value.append(False)
+                
+                    elif file_format == rule['valoare_regula']:
+                        rule_value.append(True)
+                
+                    else:
+                        rule_value.append(False)
                          
                 if False in rule_value:
                     ReportWriter.write_fail(rule=rule, verify=gpkg_files)
@@ -339,9 +338,10 @@ class CategoryThree:
                 return int(rule['tip_alerta_id']) != 1 # False only if Blocker
     
 class CategoryFour:
-    def __init__(self, validation_type, zip_path):
+    def __init__(self, validation_type, zip_path, archive):
         self.validation_type = validation_type 
         self.zip_path = zip_path
+        self.archive = archive
     
     # Checks if there are the correct number of layers
     def rule_16(self, rule, gdf):
@@ -455,10 +455,7 @@ class CategoryFour:
                 for column in columns:
                     col_data = gdf[layer][column]
                     
-                    null_indices = [
-                        i + 1 for i, value in enumerate(col_data)
-                        if value in [None, "", "NULL"] or (isinstance(value, float) and np.isnan(value))
-                    ]
+                    null_indices = positions(null_mask(col_data))
                     
                     if column in special_columns and len(null_indices) == len(col_data):
                         columns_null[column] = "Nu contine date!"
@@ -477,7 +474,7 @@ class CategoryFour:
                 return int(rule['tip_alerta_id']) != 1 # False only if Blocker
     
     # Checks if the dtype of the data is correct
-    def rule_22(self, rule, gdf):
+    def rule_22(self, rule, gdf, column_cache):
         if int(self.validation_type) in [1, 2, 3, 4]:
             try:
                 rule_value = []
@@ -494,10 +491,10 @@ class CategoryFour:
                     else:
                         if gdf[layer][column].dtype == 'O':
                             
-                            gdf[layer][column] = pd.to_datetime(gdf[layer][column], errors='coerce')
-                            gdf[layer][column] = gdf[layer][column].astype('datetime64[ms]')
+                            # The text is parsed as dates for this check only, the layer keeps its text
+                            parsed = column_cache.convert(layer, column, 'datetime64[ms]')
                             
-                            if gdf[layer][column].dtype == dtype:
+                            if parsed.dtype == dtype:
                             
                                 rule_value.append(True)
                             
@@ -505,7 +502,7 @@ class CategoryFour:
                                 rule_value.append(False)
                                 columns_wd.append(column)
                                 columns_wd.append(dtype)
-                                columns_wd.append(gdf[layer][column].dtype)
+                                columns_wd.append(parsed.dtype)
                 
                 if False in rule_value:
                     ReportWriter.write_fail(rule=rule, verify=columns_wd)
@@ -519,7 +516,7 @@ class CategoryFour:
                 return int(rule['tip_alerta_id']) != 1 # False only if Blocker
     
     # Checks if the data has the correct name/structure inside the layer columns
-    def rule_23(self, rule, gdf, cod_zf, h1, h2, h3):
+    def rule_23(self, rule, gdf, vocabularies):
         if int(self.validation_type) in [1, 2, 3, 4]:
             try:
                 columns_wd = {}
@@ -529,64 +526,30 @@ class CategoryFour:
                 
                 columns_dtypes: list = data.split(',')
                 
+                # The reference codes every check_ type is looked up in
+                code_lists = {
+                    'check_cod': vocabularies.zfzrs,
+                    'check_h1': vocabularies.hilucs1,
+                    'check_h2': vocabularies.hilucs2,
+                    'check_h3': vocabularies.hilucs3
+                }
+                
                 for column_dtype in columns_dtypes:
                     column, dtype = column_dtype.split('-')
                     col_data = gdf[layer][column]
-                    if dtype == 'check_cod':
-                        wrong_data = [
-                            i + 1 for i, value in enumerate(col_data)
-                            if value is not None and not (isinstance(value, float) and np.isnan(value))
-                            and not value in cod_zf['definitie'].to_list()
-                        ]
-                    elif dtype == 'check_h1':
-                        wrong_data = [
-                            i + 1 for i, value in enumerate(col_data)
-                            if value is not None and not (isinstance(value, float) and np.isnan(value))
-                            and not value in h1['definitie'].to_list()
-                        ]
-                    elif dtype == 'check_h2':
-                        wrong_data = [
-                            i + 1 for i, value in enumerate(col_data)
-                            if value is not None and not (isinstance(value, float) and np.isnan(value))
-                            and not value in h2['definitie'].to_list()
-                        ]
-                    elif dtype == 'check_h3':
-                        wrong_data = [
-                            i + 1 for i, value in enumerate(col_data)
-                            if value is not None and not (isinstance(value, float) and np.isnan(value))
-                            and not value in h3['definitie'].to_list()
-                        ]
+                    if dtype in code_lists:
+                        wrong_data = positions(~missing_mask(col_data) & ~col_data.isin(code_lists[dtype]))
                     elif dtype == 'Date':
-                        wrong_data = [
-                            i + 1 for i, value in enumerate(col_data)
-                            if value is not None and not (isinstance(value, float) and np.isnan(value))
-                            and not re.match(r'^\d{4}-(0[1-9]|1[0-2])-(0[1-9]|[12][0-9]|3[01])(?: 00:00:00(?:\+00:00)?)?$', str(value).strip())
-                        ]
+                        wrong_data = positions(~missing_mask(col_data) & ~match_mask(col_data, DATE_PATTERN, strip=True))
                     elif dtype == 'Date_2':
-                        wrong_data = [
-                            i + 1 for i, value in enumerate(col_data)
-                            if value is not None and not (isinstance(value, float) and np.isnan(value))
-                            and not re.match(r'^\d{1,6}\/(0[1-9]|[1-2][0-9]|3[0-1])\.(0[1-9]|1[0-2])\.\d{4}$', str(value).strip())
-                        ]
+                        wrong_data = positions(~missing_mask(col_data) & ~match_mask(col_data, DATE_2_PATTERN, strip=True))
                     elif dtype == 'Zecimale':
-                        wrong_data = [
-                            i + 1 for i, value in enumerate(col_data)
-                            if value is not None and not (isinstance(value, float) and np.isnan(value))
-                            and not re.match(r'^\d*\.\d{1,2}$', str(value))
-                        ]
+                        wrong_data = positions(~missing_mask(col_data) & ~match_mask(col_data, DECIMALS_PATTERN))
                     elif dtype == 'HCL':
-                        wrong_data = [
-                            i + 1 for i, value in enumerate(col_data)
-                            if value is not None and not (isinstance(value, float) and np.isnan(value))
-                            and not re.match(r'^\d{1,6}$', str(value))
-                        ]
+                        wrong_data = positions(~missing_mask(col_data) & ~match_mask(col_data, HCL_PATTERN))
                     else:
                         item_list = dtype.split('_')
-                        wrong_data = [
-                            i + 1 for i, value in enumerate(col_data)
-                            if value is not None and not (isinstance(value, float) and np.isnan(value))
-                            and value not in item_list
-                        ]
+                        wrong_data = positions(~missing_mask(col_data) & ~col_data.isin(item_list))
                     
                     if wrong_data:
                         columns_wd[column] = wrong_data
@@ -601,33 +564,29 @@ class CategoryFour:
                 return int(rule['tip_alerta_id']) != 1 # False only if Blocker
     
     # Checks if the temporial data is correct    
-    def rule_24(self, rule, gdf):
+    def rule_24(self, rule, gdf, column_cache):
         if int(self.validation_type) in [1, 2, 3, 4]:
             try:
                 layer = rule['formula_regula']
                 columns: list = rule['valoare_regula'].split(",")
                 current_date = datetime.now()
                 
+                # A date that is missing or couldn't be parsed (NaT) never compares as valid
                 if "Data_aprob" in columns and "Data_exp" in columns:
-                    index_fail = [
-                        i + 1 
-                        for i in range(len(gdf[layer]['Data_aprob']))
-                        if not (gdf[layer]['Data_aprob'][i] <= current_date <= gdf[layer]['Data_exp'][i])
-                    ]
+                    data_aprob = column_cache.convert(layer, 'Data_aprob', 'datetime64[ms]')
+                    data_exp = column_cache.convert(layer, 'Data_exp', 'datetime64[ms]')
+                    valid = (data_aprob <= current_date) & (data_exp >= current_date)
                 
                 elif "Data_exp" in columns and len(columns) == 1:
-                    index_fail = [
-                        i + 1 
-                        for i in range(len(gdf[layer]['Data_exp']))
-                        if not (current_date >= gdf[layer]['Data_exp'][i])
-                    ]
+                    valid = column_cache.convert(layer, 'Data_exp', 'datetime64[ms]') <= current_date
                 
                 elif "Revizie" in columns and len(columns) == 1:
-                    index_fail = [
-                        i + 1 
-                        for i in range(len(gdf[layer]['Revizie']))
-                        if not (current_date >= gdf[layer]['Revizie'][i])
-                    ]
+                    valid = column_cache.convert(layer, 'Revizie', 'datetime64[ms]') <= current_date
+                
+                else:
+                    raise ValueError(f"No date check for the columns {rule['valoare_regula']}")
+                
+                index_fail = positions(~valid)
             
                 if index_fail:
                     ReportWriter.write_fail(rule=rule, verify=index_fail)
@@ -641,36 +600,26 @@ class CategoryFour:
                 return int(rule['tip_alerta_id']) != 1 # False only if Blocker
     
     # Checks if the hilucs hierarchy and names are correct
-    def rule_25(self, rule, gdf, h1, h2, h3):
+    def rule_25(self, rule, gdf, vocabularies):
         if int(self.validation_type) in [1, 2, 3, 4]:
             try:
-                index_fail = set()
-                
                 layer = rule['formula_regula']
                 columns = rule['valoare_regula'].split(',')
                 
-                h1_list = list(h1['definitie'])
-                h2_list = list(h2['definitie'])
-                h3_list = list(h3['definitie'])
-
-                for i in range(len(gdf[layer])):
-                    hilucs_1 = gdf[layer][columns[0]][i]
-                    hilucs_2 = gdf[layer][columns[1]][i]
-                    hilucs_3 = gdf[layer][columns[2]][i]
-                    
-                    h1_class = re.sub(r'[^\d_]', '', hilucs_1) if hilucs_1 is not None else ""
-                    h2_class = re.sub(r'[^\d_]', '', hilucs_2) if hilucs_2 is not None else ""
-                    
-                    if hilucs_1 not in h1_list:
-                        index_fail.add(i + 1)
-                        
-                    if hilucs_2 is not None:
-                        if h1_class not in hilucs_2 or hilucs_2 not in h2_list:\
-                            index_fail.add(i + 1)
-                    
-                    if hilucs_3 is not None:
-                        if h2_class not in hilucs_3 or hilucs_3 not in h3_list:
-                            index_fail.add(i + 1)
+                hilucs_1 = gdf[layer][columns[0]]
+                hilucs_2 = gdf[layer][columns[1]]
+                hilucs_3 = gdf[layer][columns[2]]
+                
+                # The class prefix of a code, its digits and underscores, an empty code has none
+                h1_class = hilucs_1.str.replace(r'[^\d_]', '', regex=True).fillna("")
+                h2_class = hilucs_2.str.replace(r'[^\d_]', '', regex=True).fillna("")
+                
+                wrong_1 = ~hilucs_1.isin(vocabularies.hilucs1)
+                # A level is only checked when it is filled, against the list and the class of the level above
+                wrong_2 = hilucs_2.notna() & (~contains_mask(hilucs_2.fillna(""), h1_class) | ~hilucs_2.isin(vocabularies.hilucs2))
+                wrong_3 = hilucs_3.notna() & (~contains_mask(hilucs_3.fillna(""), h2_class) | ~hilucs_3.isin(vocabularies.hilucs3))
+                
+                index_fail = set(positions(wrong_1 | wrong_2 | wrong_3))
 
                 if index_fail:
                     ReportWriter.write_fail(rule=rule, verify=index_fail)
@@ -688,17 +637,11 @@ class CategoryFour:
         if int(self.validation_type) in [1, 2, 3, 4]:
             try:
                 column_fail = {}
-                index_fail = []
                 
                 layer_1, column_1 = rule['formula_regula'].split(":")
                 layer_2, column_2 = rule['valoare_regula'].split(":")
                 
-                cods = gdf[layer_1][column_1].to_list()
-                to_check = gdf[layer_2][column_2].to_list()
-
-                for i in range(len(to_check)):
-                    if to_check[i] not in cods:
-                        index_fail.append(i+1)
+                index_fail = join_positions(gdf[layer_2][column_2], gdf[layer_1][column_1], found=False)
                 
                 if index_fail:
                     column_fail[column_2] = index_fail
@@ -754,10 +697,7 @@ class CategoryFour:
                 layer = rule['formula_regula']
                 column_data = gdf[layer]['geometry']
                 
-                index_fail = [
-                    i + 1 for i, geom in enumerate(column_data)
-                    if geom is None or geom == "" or (isinstance(geom, float) and np.isnan(geom))
-                ]
+                index_fail = positions(shapely.is_missing(column_data.values))
                 
                 if index_fail:
                     ReportWriter.write_fail(rule=rule, verify=index_fail)
@@ -795,10 +735,9 @@ class CategoryFour:
                 layer = rule['formula_regula']
                 column_data = gdf[layer]['geometry']
                 
-                index_fail = [
-                    i + 1 for i in range(len(column_data))
-                    if not column_data.iloc[i].is_valid
-                ]
+                # The NULL geometries are reported by rule 29, they are not checked here
+                geometries = column_data.values
+                index_fail = positions(~shapely.is_missing(geometries) & ~shapely.is_valid(geometries))
                 
                 if index_fail:
                     ReportWriter.write_fail(rule=rule, verify=index_fail)
@@ -832,7 +771,8 @@ class CategoryFour:
                     uat_db_boundary = uat_db_boundary.set_crs(target_crs)
                     uat_db_boundary_buffered = uat_db_boundary.buffer(10)
                     
-                    rule_value = gdf_boundary.within(uat_db_boundary_buffered).all()
+                    # Every row of the layer is checked against the row of the same index, as geopandas aligns them
+                    rule_value = aligned_contains_mask(uat_db_boundary_buffered, gdf_boundary).all()
                     
                 if rule_value == False:
                     ReportWriter.write_fail(rule=rule)
@@ -855,7 +795,7 @@ class CategoryFour:
                 if uat_db is None:
                     rule_value = False
                 else:
-                    rule_value = uat_db.geometry.contains(gdf[layer]["geometry"]).all()
+                    rule_value = aligned_contains_mask(uat_db.geometry, gdf[layer]["geometry"]).all()
                     
                 if rule_value == False:
                     ReportWriter.write_fail(rule=rule)
@@ -877,11 +817,10 @@ class CategoryFour:
                 
                 geom_tbi = gdf[layer_tbi]['geometry'][0]
                 geom_tfi = gdf[layer_tfi]['geometry']
+                # A row without a geometry is an error, as it was when every row was tested on its own
+                require_geometries(geom_tfi.values)
                 
-                index_fail = [
-                    i + 1 for i, geom in enumerate(geom_tfi)
-                    if not geom.within(geom_tbi.buffer(0.1))
-                ]
+                index_fail = positions(~within_mask(geom_tfi.values, geom_tbi.buffer(0.1)))
                 
                 if index_fail:
                     ReportWriter.write_fail(rule=rule)
@@ -895,16 +834,15 @@ class CategoryFour:
                 return int(rule['tip_alerta_id']) != 1 # False only if Blocker
     
     # Checks if some layers cover the PlanSpatial completely
-    def rule_34(self, rule, gdf):
+    def rule_34(self, rule, gdf, unions):
         if int(self.validation_type) in [1, 2, 3, 4]:
             try:
                 layer_to_cover = rule['formula_regula']
                 layer_to_be_covered = rule['valoare_regula']
                 
-                column_data = gdf[layer_to_cover]['geometry']
                 geom = gdf[layer_to_be_covered]['geometry'][0]
                 
-                rule_value = geom.area - 50 <= column_data.unary_union.area
+                rule_value = geom.area - 50 <= unions[layer_to_cover].area
                 
                 if rule_value == False:
                     ReportWriter.write_fail(rule=rule)
@@ -921,35 +859,16 @@ class CategoryFour:
     def rule_35(self, rule, gdf):
         if int(self.validation_type) in [1, 2, 3, 4]:
             try:
-                overlap_pairs = []
-                unique_pairs = set()
-                filtered_pairs = []
-                
                 layer = rule['formula_regula']
                 column_data = gdf[layer]['geometry']
                 
-                sindex = column_data.sindex
-                
-                for i, geom in enumerate(column_data):
-                    bbox = geom.bounds
-                    overlaps = list(sindex.intersection(bbox))
-                    
-                    for j in overlaps:
-                        if i != j and geom.overlaps(column_data.iloc[j]):
-                            overlap_pairs.append((int(i+1), int(j+1)))
-                
-                if overlap_pairs:
-                    rule_value = False
-                    for pair in overlap_pairs:
-                        sorted_pair = tuple(sorted(pair))
-
-                        if sorted_pair not in unique_pairs:
-                            filtered_pairs.append(pair)
-                            unique_pairs.add(sorted_pair)
-                else:
-                    rule_value = True
+                # Every overlapping pair in one query of the spatial index, the same order as one query per geometry
+                first, second = column_data.sindex.query(column_data.values, predicate='overlaps')
+                # A pair is found from both of its geometries, it is kept as it is first found
+                first_found = first < second
+                filtered_pairs = list(zip((first[first_found] + 1).tolist(), (second[first_found] + 1).tolist()))
                     
-                if rule_value == False:
+                if filtered_pairs:
                     ReportWriter.write_fail(rule=rule, verify=filtered_pairs)
                     return int(rule['tip_alerta_id']) != 1  # False only if Blocker
                 
@@ -969,13 +888,16 @@ class CategoryFour:
                 
                 layer = rule['formula_regula']
                 
-                column_data = gdf[layer]['geometry']
+                # The rows are counted among the geometries that aren't NULL
+                column_data = gdf[layer]['geometry'].dropna()
                 
-                index_fail = [
-                    i + 1 for i, geom in enumerate(column_data.dropna())
-                    if geom.area < area_threshold 
-                    and (geom.length / geom.area if geom.area > 0 else float('inf')) > aspect_ratio_threshold
-                ]
+                area = shapely.area(column_data.values)
+                length = shapely.length(column_data.values)
+                # A polygon without area is as thin as a sliver can be
+                aspect_ratio = np.full(len(area), float('inf'))
+                np.divide(length, area, out=aspect_ratio, where=area > 0)
+                
+                index_fail = positions((area < area_threshold) & (aspect_ratio > aspect_ratio_threshold))
                 
                 if index_fail:
                     ReportWriter.write_fail(rule=rule, verify=index_fail)
@@ -992,19 +914,17 @@ class CategoryFour:
     def rule_37(self, rule, gdf):
         if int(self.validation_type) in [1, 2, 3, 4]:
             try:
-                list_of_codes = []
-                index_fail = []
-                
                 layer = rule['formula_regula']
                 cod_column = rule['valoare_regula']
                 
                 column_data = gdf[layer][cod_column]
                 
-                for i, code in enumerate(column_data):
-                    if code in list_of_codes:
-                        index_fail.append( i+1 )
-                    else:
-                        list_of_codes.append(code)
+                # Every repeat of a code after its first row
+                duplicates = column_data.duplicated(keep='first')
+                if column_data.dtype.kind == 'f':
+                    # A NaN read from a float column never equals another one
+                    duplicates &= column_data.notna()
+                index_fail = positions(duplicates)
                 
                 if index_fail:
                     ReportWriter.write_fail(rule=rule, verify=index_fail)
@@ -1022,17 +942,11 @@ class CategoryFour:
         if int(self.validation_type) in [1, 2, 3, 4]:
             try:
                 column_fail = {}
-                index_fail = []
                 
                 layer_1, column_1 = rule['formula_regula'].split(":")
                 layer_2, column_2 = rule['valoare_regula'].split(":")
                 
-                cods = gdf[layer_1][column_1].to_list()
-                to_check = gdf[layer_2][column_2].to_list()
-
-                for i in range(len(to_check)):
-                    if to_check[i] in cods:
-                        index_fail.append(i+1)
+                index_fail = join_positions(gdf[layer_2][column_2], gdf[layer_1][column_1], found=True)
                 
                 if index_fail:
                     column_fail[column_2] = index_fail
@@ -1050,31 +964,18 @@ class CategoryFour:
     def rule_39(self, rule, gdf, zfzrs):
         if int(self.validation_type) in [1, 2, 3, 4]:
             try:
-                index_fail = []
-                
                 layer = rule['formula_regula']
                 cod, tip = rule['valoare_regula'].split(',')
                 
                 cod_column = gdf[layer][cod]
                 tip_column = gdf[layer][tip]
                 
-                romanian_map = {
-                    '\u015F': '\u0219',  # ş -> ș
-                    '\u0163': '\u021B',  # ţ -> ț
-                }
+                # The long name of every code, from its first row in the list
+                names = zfzrs.drop_duplicates('definitie').set_index('definitie')['definite_lung']
+                # A code missing from the list has no name to match
+                expected = cod_column.map(names)
                 
-                for i in range(len(cod_column)):
-                    cod_zf_zrs = cod_column[i]
-                    tip_zf_zrs = tip_column[i]
-                    
-                    row = np.where(zfzrs['definitie'] == cod_zf_zrs)[0][0]
-                    to_check = zfzrs['definite_lung'][row].strip()
-                    for old_char, new_char in romanian_map.items():
-                        tip_zf_zrs = tip_zf_zrs.replace(old_char, new_char)
-                        element_check = to_check.replace(old_char, new_char)  
-                    
-                    if tip_zf_zrs.strip() != element_check:
-                        index_fail.append(i+1)
+                index_fail = positions(normalized_text(tip_column) != normalized_text(expected))
                 
                 if index_fail:
                     ReportWriter.write_fail(rule=rule, verify=index_fail)
@@ -1097,22 +998,15 @@ class CategoryFour:
                 columns = [rule['valoare_regula']] if ',' not in rule['valoare_regula'] else rule['valoare_regula'].split(',')
                 
                 for column in columns:
-                    value_list = gdf[layer][column].to_list()
-                    unique_values = list(set(value_list))
+                    column_data = gdf[layer][column]
+                    # A NaN read from a float column never equals another one, every NaN is a value seen once
+                    float_nans = int(column_data.isna().sum()) if column_data.dtype.kind == 'f' else 0
+                    counts = column_data.value_counts(dropna=column_data.dtype.kind == 'f')
                     
-                    if len(unique_values) != 1:
-                        values = {}
-                        for value in unique_values:
-                            numb_val = value_list.count(value)
-                            values[value] = numb_val
-                
-                        max_value = max(values.values())
-                        ids_to_get = [key for key, value in values.items() if value != max_value]
-
-                        for i in range(len(gdf[layer][column])):
-                            time_to_check = gdf[layer][column][i]
-                            if time_to_check in ids_to_get:
-                                index_fail.append(i+1)
+                    if len(counts) + float_nans > 1:
+                        max_value = max(counts.max() if len(counts) else 0, 1 if float_nans else 0)
+                        # The rows that don't hold one of the most frequent values
+                        index_fail.extend(positions(column_data.isin(counts.index[counts != max_value])))
                 
                 if index_fail:
                     ReportWriter.write_fail(rule=rule, verify=index_fail)
@@ -1132,10 +1026,7 @@ class CategoryFour:
                 layer = rule['formula_regula']
                 column_data = gdf[layer]['geometry']
                 
-                index_fail = [
-                    i + 1 for i, geom in enumerate(column_data)
-                    if geom is not None and geom.has_z
-                ]
+                index_fail = positions(shapely.has_z(column_data.values))
                 
                 if index_fail:
                     ReportWriter.write_fail(rule=rule, verify=index_fail)
@@ -1152,26 +1043,24 @@ class CategoryFour:
     def rule_42(self, rule, gdf):
         if int(self.validation_type) in [1, 2, 3, 4]:
             try:
-                index_fail = []
-                
                 layer, unit = rule['formula_regula'].split('-')
                 column = rule['valoare_regula']
                 
                 column_data = gdf[layer][column]
                 geometry_data = gdf[layer]["geometry"]
-                    
-                for i in range(len(geometry_data)):
-                    if unit == 'ha':
-                        value = round(geometry_data[i].area, 2) / 10000
-                    elif unit == 'm':
-                        value = round(geometry_data[i].area, 2)
-                        
-                    result = abs(value - float(column_data[i]))
-                    value_1 = float(f'{result:.2f}')
-                    within_tolerance = value_1 <= 0.1
-                    
-                    if within_tolerance == False:
-                        index_fail.append(i + 1)
+                # A row without a geometry has no area, it is an error as it was when every row was measured on its own
+                require_geometries(geometry_data.values)
+                
+                area = np.round(shapely.area(geometry_data.values), 2)
+                if unit == 'ha':
+                    value = area / 10000
+                elif unit == 'm':
+                    value = area
+                
+                result = np.abs(value - column_data.to_numpy(dtype=float))
+                within_tolerance = np.round(result, 2) <= 0.1
+                
+                index_fail = positions(~within_tolerance)
                         
                 if index_fail:
                     ReportWriter.write_fail(rule=rule, verify=index_fail)
@@ -1188,22 +1077,20 @@ class CategoryFour:
     def rule_43(self, rule, gdf):
         if int(self.validation_type) in [1, 2, 3, 4]:
             try:
-                index_fail = []
                 layer = rule['formula_regula']
                 column = rule['valoare_regula']
                 
                 column_data = gdf[layer][column]
                 geometry_data = gdf[layer]["geometry"]
+                # A row without a geometry has no length, it is an error as it was when every row was measured on its own
+                require_geometries(geometry_data.values)
                 
-                for i in range(len(geometry_data)):
-                    value = round(geometry_data[i].length, 2)
-                    
-                    result = abs(value - float(column_data[i]))
-                    value = float(f'{result:.2f}')
-                    within_tolerance = value <= 0.1
-                    
-                    if within_tolerance == False:
-                        index_fail.append(i + 1)
+                value = np.round(shapely.length(geometry_data.values), 2)
+                
+                result = np.abs(value - column_data.to_numpy(dtype=float))
+                within_tolerance = np.round(result, 2) <= 0.1
+                
+                index_fail = positions(~within_tolerance)
                 
                 if index_fail:
                     ReportWriter.write_fail(rule=rule, verify=index_fail)
@@ -1226,17 +1113,12 @@ class CategoryFour:
                 column_data_1 = gdf[layer_1][col_1]
                 column_data_2 = gdf[layer_2][col_2]
                 
-                area_1 = 0
-                area_2 = 0
-                
-                for index, value in enumerate(column_data_1):
-                    area_1 +=value
-                for index, value in enumerate(column_data_2):
-                    area_2 +=value                    
+                # A NaN area makes the sums differ, as it did when they were added one by one
+                area_1 = column_data_1.sum(skipna=False)
+                area_2 = column_data_2.sum(skipna=False)
                 
                 result = abs(area_1 - area_2)
-                value = float(f'{result:.2f}')
-                within_tolerance = value <= 0.1
+                within_tolerance = np.round(result, 2) <= 0.1
                 
                 if not within_tolerance:
                     ReportWriter.write_fail(rule=rule)
@@ -1270,13 +1152,6 @@ class CategoryFour:
     def rule_46(self, rule, gdf):
         if int(self.validation_type) in [1, 2, 3, 4]:
             try:
-                index_fail = []
-                
-                romanian_map = {
-                    '\u015F': '\u0219',  # ş -> ș
-                    '\u0163': '\u021B',  # ţ -> ț
-                }
-                
                 layer_1, columns_1 = rule['formula_regula'].split('-')
                 cod_1, tip_1, zona_1 = columns_1.split(',')
                 
@@ -1290,17 +1165,15 @@ class CategoryFour:
                 gdf_l2_c2 = gdf[layer_2][cod_2]
                 gdf_l2_t2 = gdf[layer_2][tip_2]
                 
-                for i in range(len(gdf_l1_t1)):
-                    if gdf_l1_c1[i] in gdf_l2_c2.to_list():
-                        if gdf_l1_t1[i].strip() not in [element.strip() for element in gdf_l2_t2]:
-                            index_fail.append(i+1)                            
-                        
-                        for old_char, new_char in romanian_map.items():
-                            zona_tip_element = zona_tip.replace(old_char, new_char).strip()
-                            gdf_l1_z1_element = gdf_l1_z1[i].replace(old_char, new_char).strip()
-                        
-                        if zona_tip_element != gdf_l1_z1_element:
-                            index_fail.append(i+1)                                    
+                # Only the rows whose code is in the second layer are checked
+                known = gdf_l1_c1.isin(gdf_l2_c2).to_numpy()
+                # The type has to be one the second layer gives the same code
+                pairs = pd.MultiIndex.from_arrays([gdf_l2_c2, gdf_l2_t2.astype(object).str.strip()])
+                wrong_type = known & ~pd.MultiIndex.from_arrays([gdf_l1_c1, gdf_l1_t1.astype(object).str.strip()]).isin(pairs)
+                wrong_zone = known & (normalized_text(gdf_l1_z1) != zona_tip.translate(ROMANIAN_LETTERS).strip()).to_numpy()
+                
+                # A row is reported once for every check it fails
+                index_fail = np.repeat(np.arange(1, len(known) + 1), wrong_type.astype(int) + wrong_zone.astype(int)).tolist()
                         
                 if index_fail:
                     ReportWriter.write_fail(rule=rule, verify=index_fail)
@@ -1,25 +1,140 @@
-import os
 import re
 import ast
 import csv
 import json
-import fiona
-import shutil
-import zipfile
 import logging
+import multiprocessing
 import pandas as pd
 import numpy as np
-import tempfile
 from datetime import datetime
 import filetype
-import geopandas as gpd
 from shapely.geometry import shape
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
 
 from .writer import ReportWriter
+from .archive import ArchiveIndex
+from .layers import LayerDict
+from .columns import ColumnCache, Vocabularies
+from .geometry import UnionCache
 from .rules import CategoryOne, CategoryTwo, CategoryThree, CategoryFour
 
+class RuleSpec(NamedTuple):
+    """Describes how a rule type is dispatched."""
+    category: int                   # The tip_validare_id the rule belongs to
+    handler: Callable               # The rule method of the category class
+    inputs: Tuple[str, ...] = ()    # The keyword arguments the rule needs besides the rule itself
+    pool: Optional[str] = 'thread'  # 'thread' for GEOS/IO work, 'process' for pure Python loops, None if it changes the inputs
+    columns: Optional[Callable] = None  # Returns the layers and columns the rule reads, None if it reads no layer data
+
+# Which layers and columns a rule reads, a layer mapped to None reads all of its columns
+def layer_geometry(rule):
+    return {rule['formula_regula']: set()}
+
+def layer_all_columns(rule):
+    return {rule['formula_regula']: None}
+
+def layer_columns(rule):
+    return {rule['formula_regula']: set(rule['valoare_regula'].split(','))}
+
+def layer_typed_columns(rule):
+    return {rule['formula_regula']: {column_dtype.split('-')[0] for column_dtype in rule['valoare_regula'].split(',')}}
+
+def layer_unit_column(rule):
+    return {rule['formula_regula'].split('-')[0]: {rule['valoare_regula']}}
+
+def layers_geometry(rule):
+    return {rule['formula_regula']: set(), rule['valoare_regula']: set()}
+
+def layers_joined_columns(rule):
+    layer_1, column_1 = rule['formula_regula'].split(':')
+    layer_2, column_2 = rule['valoare_regula'].split(':')
+    return merge_columns({layer_1: {column_1}}, {layer_2: {column_2}})
+
+def layers_summed_columns(rule):
+    layer_1, column_1 = rule['formula_regula'].split('-')
+    layer_2, column_2 = rule['valoare_regula'].split('-')
+    return merge_columns({layer_1: {column_1}}, {layer_2: {column_2}})
+
+def layers_matched_columns(rule):
+    layer_1, columns_1 = rule['formula_regula'].split('-')
+    layer_2, columns_2 = rule['valoare_regula'].split('-')
+    # The last value of the second layer is the expected zone type, not a column
+    return merge_columns({layer_1: set(columns_1.split(','))}, {layer_2: set(columns_2.split(',')[:2])})
+
+def merge_columns(projection, other):
+    """Adds the layers and columns of other to projection."""
+    for layer, columns in other.items():
+        if columns is None or projection.get(layer, set()) is None:
+            projection[layer] = None
+        else:
+            projection[layer] = projection.get(layer, set()) | columns
+    return projection
+
+# Maps every tip_regula_id to its handler, built once at import
+RULE_REGISTRY: Dict[int, RuleSpec] = {
+    # Category 1 - the archive
+    1: RuleSpec(1, CategoryOne.rule_1),
+    2: RuleSpec(1, CategoryOne.rule_2),
+    # Category 2 - the structure of the archive, looked up in the index
+    3: RuleSpec(2, CategoryTwo.rule_3),
+    4: RuleSpec(2, CategoryTwo.rule_4),
+    5: RuleSpec(2, CategoryTwo.rule_5),
+    6: RuleSpec(2, CategoryTwo.rule_6),
+    7: RuleSpec(2, CategoryTwo.rule_7),
+    8: RuleSpec(2, CategoryTwo.rule_8),
+    9: RuleSpec(2, CategoryTwo.rule_9),
+    10: RuleSpec(2, CategoryTwo.rule_10),
+    11: RuleSpec(2, CategoryTwo.rule_11),
+    12: RuleSpec(2, CategoryTwo.rule_12),
+    13: RuleSpec(2, CategoryTwo.rule_13),
+    # Category 3 - the files inside the archive
+    14: RuleSpec(3, CategoryThree.rule_14),
+    15: RuleSpec(3, CategoryThree.rule_15),
+    # Category 4 - the layers of the gpkg
+    16: RuleSpec(4, CategoryFour.rule_16, ('gdf',)),
+    17: RuleSpec(4, CategoryFour.rule_17, ('gdf',)),
+    18: RuleSpec(4, CategoryFour.rule_18, ('gdf',), columns=layer_all_columns),
+    19: RuleSpec(4, CategoryFour.rule_19, ('gdf',), columns=layer_all_columns),
+    20: RuleSpec(4, CategoryFour.rule_20, ('gdf',), columns=layer_geometry),
+    21: RuleSpec(4, CategoryFour.rule_21, ('gdf',), columns=layer_columns),
+    22: RuleSpec(4, CategoryFour.rule_22, ('gdf', 'column_cache'), columns=layer_typed_columns),
+    23: RuleSpec(4, CategoryFour.rule_23, ('gdf', 'vocabularies'), columns=layer_typed_columns),
+    24: RuleSpec(4, CategoryFour.rule_24, ('gdf', 'column_cache'), columns=layer_columns),
+    25: RuleSpec(4, CategoryFour.rule_25, ('gdf', 'vocabularies'), columns=layer_columns),
+    26: RuleSpec(4, CategoryFour.rule_26, ('gdf',), columns=layers_joined_columns),
+    27: RuleSpec(4, CategoryFour.rule_27, ('gdf',), columns=layer_geometry),
+    28: RuleSpec(4, CategoryFour.rule_28, ('gdf',), columns=layer_geometry),
+    29: RuleSpec(4, CategoryFour.rule_29, ('gdf',), columns=layer_geometry),
+    30: RuleSpec(4, CategoryFour.rule_30, ('gdf',), columns=layer_geometry),
+    31: RuleSpec(4, CategoryFour.rule_31, ('gdf',), columns=layer_geometry),
+    32: RuleSpec(4, CategoryFour.rule_32, ('gdf',), columns=layer_columns),
+    33: RuleSpec(4, CategoryFour.rule_33, ('gdf',), columns=layers_geometry),
+    34: RuleSpec(4, CategoryFour.rule_34, ('gdf', 'unions'), columns=layers_geometry),
+    35: RuleSpec(4, CategoryFour.rule_35, ('gdf',), columns=layer_geometry),
+    36: RuleSpec(4, CategoryFour.rule_36, ('gdf',), columns=layer_geometry),
+    37: RuleSpec(4, CategoryFour.rule_37, ('gdf',), columns=layer_columns),
+    38: RuleSpec(4, CategoryFour.rule_38, ('gdf',), columns=layers_joined_columns),
+    39: RuleSpec(4, CategoryFour.rule_39, ('gdf', 'zfzrs'), columns=layer_columns),
+    40: RuleSpec(4, CategoryFour.rule_40, ('gdf',), columns=layer_columns),
+    41: RuleSpec(4, CategoryFour.rule_41, ('gdf',), columns=layer_geometry),
+    42: RuleSpec(4, CategoryFour.rule_42, ('gdf',), columns=layer_unit_column),
+    43: RuleSpec(4, CategoryFour.rule_43, ('gdf',), columns=layer_columns),
+    44: RuleSpec(4, CategoryFour.rule_44, ('gdf',), columns=layers_summed_columns),
+    45: RuleSpec(4, CategoryFour.rule_45, ('gdf',), columns=layer_columns),
+    46: RuleSpec(4, CategoryFour.rule_46, ('gdf',), columns=layers_matched_columns)
+}
+
+def run_rule(handler, category, rule, inputs):
+    """Runs a rule and returns if it completed, its result and the report rows it wrote."""
+    with ReportWriter.capture() as rows:
+        try:
+            return True, handler(category, rule=rule, **inputs), rows
+        except:
+            return False, None, rows
+
 class Validation:
-    def __init__(self, tip_validare, zipfilepath, metadata, zfzrs, hilucs1, hilucs2, hilucs3):
+    def __init__(self, tip_validare, zipfilepath, metadata, zfzrs, hilucs1, hilucs2, hilucs3, max_workers=0, use_processes=False, evict_layers=False):
         self.tip_validare = tip_validare
         self.zipfilepath = zipfilepath
         self.metadata = metadata
@@ -27,434 +142,93 @@ class Validation:
         self.hilucs1 = hilucs1
         self.hilucs2 = hilucs2
         self.hilucs3 = hilucs3
+        # 0 runs the rules one after another, otherwise the size of the rule pools
+        self.max_workers = max_workers
+        # If False the rules meant for processes run on threads as well
+        self.use_processes = use_processes
+        # If True a layer is let go of once no remaining rule reads it
+        self.evict_layers = evict_layers
     
     def validate(self):
-        category_1 = CategoryOne(validation_type = self.tip_validare, zip_path = self.zipfilepath)
-        category_2 = CategoryTwo(validation_type = self.tip_validare, zip_path = self.zipfilepath)
-        category_3 = CategoryThree(validation_type = self.tip_validare, zip_path = self.zipfilepath)
-        category_4 = CategoryFour(validation_type = self.tip_validare, zip_path = self.zipfilepath)
+        with ArchiveIndex(self.zipfilepath, workers = self.max_workers) as archive:
+            return self.run_rules(archive)
+    
+    def run_rules(self, archive):
+        categories = {
+            1: CategoryOne(validation_type = self.tip_validare, zip_path = self.zipfilepath, archive = archive),
+            2: CategoryTwo(validation_type = self.tip_validare, zip_path = self.zipfilepath, archive = archive),
+            3: CategoryThree(validation_type = self.tip_validare, zip_path = self.zipfilepath, archive = archive),
+            4: CategoryFour(validation_type = self.tip_validare, zip_path = self.zipfilepath, archive = archive)
+        }
         
         ReportWriter.clear_csv()
         ReportWriter.write_headers()
         
         validation_passed_list = []
-        file_list, main_directory, folder_list, fisiere_list, avize_list, pdfs_list, gpkg_list, gdf = Validation.extract_data(zip_filepath=self.zipfilepath)
-        validation_category = self.metadata.tip_validare_id.unique()
+        tasks = self.schedule()
+        # The layers and columns every rule reads
+        tasks_columns = [Validation.read_columns(spec, rule_dict) for spec, rule_dict in tasks]
+        gdf = Validation.extract_data(archive=archive, projection=Validation.projection(tasks_columns))
         
-        for category in validation_category:
-            category = int(category)
-            
-            if category == 1:
-                rules = self.metadata[
-                    (self.metadata['tip_validare_id'] == int(category)) & (self.metadata['categorie_regula_id'] == int(self.tip_validare))
-                ].sort_values(by='numar_regula')
-
-                for _, rule_dict in rules.iterrows():
-                    try:
-                        # Rule 1
-                        if rule_dict['tip_regula_id'] == 1:
-                            validation_passed = category_1.rule_1(
-                                rule = rule_dict
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        # Rule 2
-                        if rule_dict['tip_regula_id'] == 2:
-                            validation_passed = category_1.rule_2(
-                                rule = rule_dict
-                            )
-                            validation_passed_list.append(validation_passed)
-                            
-                    except:
-                        pass
-            
-            elif category == 2:
-                rules = self.metadata[
-                    (self.metadata['tip_validare_id'] == int(category)) & (self.metadata['categorie_regula_id'] == int(self.tip_validare))
-                ].sort_values(by='numar_regula')
-
-                for _, rule_dict in rules.iterrows():
-                    try:
-                        # Rule 3
-                        if rule_dict['tip_regula_id'] == 3:
-                            validation_passed = category_2.rule_3(
-                                rule = rule_dict,
-                                main_dir = main_directory
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        # Rule 4
-                        if rule_dict['tip_regula_id'] == 4:
-                            validation_passed = category_2.rule_4(
-                                rule = rule_dict,
-                                main_dir = main_directory
-                            )
-                            validation_passed_list.append(validation_passed)
-                            
-                        # Rule 5
-                        if rule_dict['tip_regula_id'] == 5:
-                            validation_passed = category_2.rule_5(
-                                rule = rule_dict,
-                                folder_list = folder_list
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        # Rule 6
-                        if rule_dict['tip_regula_id'] == 6:
-                            validation_passed = category_2.rule_6(
-                                rule = rule_dict,
-                                folder_list = folder_list
-                            )
-                            validation_passed_list.append(validation_passed)
-                            
-                        # Rule 7
-                        if rule_dict['tip_regula_id'] == 7:
-                            validation_passed = category_2.rule_7(
-                                rule = rule_dict,
-                                main_directory = main_directory,
-                                file_list = file_list
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        # Rule 8
-                        if rule_dict['tip_regula_id'] == 8:
-                            validation_passed = category_2.rule_8(
-                                rule = rule_dict,
-                                gpkg_list = gpkg_list
-                            )
-                            validation_passed_list.append(validation_passed)
-                            
-                        # Rule 9
-                        if rule_dict['tip_regula_id'] == 9:
-                            validation_passed = category_2.rule_9(
-                                rule = rule_dict,
-                                gpkg_list = gpkg_list
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        # Rule 10
-                        if rule_dict['tip_regula_id'] == 10:
-                            validation_passed = category_2.rule_10(
-                                rule = rule_dict,
-                                pdfs_list = pdfs_list,
-                                avize_list = avize_list
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        # Rule 11
-                        if rule_dict['tip_regula_id'] == 11:
-                            validation_passed = category_2.rule_11(
-                                rule = rule_dict,
-                                pdfs_list = pdfs_list
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        # Rule 12
-                        if rule_dict['tip_regula_id'] == 12:
-                            validation_passed = category_2.rule_12(
-                                rule = rule_dict,
-                                avize_list = avize_list
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        # Rule 13
-                        if rule_dict['tip_regula_id'] == 13:
-                            validation_passed = category_2.rule_13(
-                                rule = rule_dict,
-                                avize_list = avize_list
-                            )
-                            validation_passed_list.append(validation_passed)
-                            
-                    except:
-                        pass
-            
-            elif category == 3:
-                rules = self.metadata[
-                    (self.metadata['tip_validare_id'] == int(category)) & (self.metadata['categorie_regula_id'] == int(self.tip_validare))
-                ].sort_values(by='numar_regula')
-
-                for _, rule_dict in rules.iterrows():
-                    try:
-                        # Rule 14
-                        if rule_dict['tip_regula_id'] == 14:
-                            validation_passed = category_3.rule_14(
-                                rule = rule_dict
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        # Rule 15
-                        if rule_dict['tip_regula_id'] == 15:
-                            validation_passed = category_3.rule_15(
-                                rule = rule_dict
-                            )
-                            validation_passed_list.append(validation_passed)
-                    except:
-                        pass
+        if self.evict_layers:
+            readers = {}
+            for columns in tasks_columns:
+                for layer in columns:
+                    readers[layer] = readers.get(layer, 0) + 1
+            gdf.retain(readers)
+        
+        # Every input a rule can ask for in the registry
+        inputs = {
+            'gdf': gdf,
+            'vocabularies': Vocabularies(self.zfzrs, self.hilucs1, self.hilucs2, self.hilucs3),
+            'zfzrs': self.zfzrs,
+            'unions': UnionCache(gdf),
+            'column_cache': ColumnCache(gdf)
+        }
+        
+        pools = self.create_pools()
+        # The running or finished rules, in the order they appear in the report
+        outcomes = []
+        
+        # Running in parallel needs every layer anyway, unless they are evicted as the rules finish
+        if pools and not self.evict_layers:
+            gdf.prefetch()
+        
+        try:
+            for (spec, rule_dict), columns in zip(tasks, tasks_columns):
+                rule_inputs = {name: inputs[name] for name in spec.inputs}
+                if isinstance(pools.get(spec.pool), ProcessPoolExecutor):
+                    rule_inputs = Validation.process_inputs(rule_inputs, columns)
+                args = (spec.handler, categories[spec.category], rule_dict, rule_inputs)
+                
+                if spec.pool in pools:
+                    outcome = pools[spec.pool].submit(run_rule, *args)
+                    outcome.add_done_callback(lambda _, layers=list(columns): gdf.release(layers))
+                else:
+                    # The rules queued before it have to finish before the inputs change
+                    wait([outcome for outcome in outcomes if isinstance(outcome, Future)])
+                    outcome = run_rule(*args)
+                    gdf.release(columns)
+                
+                outcomes.append(outcome)
             
-            elif category == 4:
-                rules = self.metadata[
-                    (self.metadata['tip_validare_id'] == int(category)) & (self.metadata['categorie_regula_id'] == int(self.tip_validare))
-                ].sort_values(by='numar_regula')
-
-                for _, rule_dict in rules.iterrows():
+            for (spec, rule_dict), outcome in zip(tasks, outcomes):
+                if isinstance(outcome, Future):
                     try:
-                        # Rule 16
-                        if rule_dict['tip_regula_id'] == 16:
-                            validation_passed = category_4.rule_16(
-                                rule = rule_dict,
-                                gdf = gdf
-                            )
-                            validation_passed_list.append(validation_passed)
-                            
-                        # Rule 17
-                        if rule_dict['tip_regula_id'] == 17:
-                            validation_passed = category_4.rule_17(
-                                rule = rule_dict,
-                                gdf = gdf
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        # Rule 18
-                        if rule_dict['tip_regula_id'] == 18:
-                            validation_passed = category_4.rule_18(
-                                rule = rule_dict,
-                                gdf = gdf
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        # Rule 19
-                        if rule_dict['tip_regula_id'] == 19:
-                            validation_passed = category_4.rule_19(
-                                rule = rule_dict,
-                                gdf = gdf
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        # Rule 20
-                        if rule_dict['tip_regula_id'] == 20:
-                            validation_passed = category_4.rule_20(
-                                rule = rule_dict,
-                                gdf = gdf
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        # Rule 21
-                        if rule_dict['tip_regula_id'] == 21:
-                            validation_passed = category_4.rule_21(
-                                rule = rule_dict,
-                                gdf = gdf
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        # Rule 22
-                        if rule_dict['tip_regula_id'] == 22:
-                            validation_passed = category_4.rule_22(
-                                rule = rule_dict,
-                                gdf = gdf
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        # Rule 23
-                        if rule_dict['tip_regula_id'] == 23:
-                            validation_passed = category_4.rule_23(
-                                rule = rule_dict,
-                                gdf = gdf,
-                                cod_zf = self.zfzrs,
-                                h1 = self.hilucs1,
-                                h2 = self.hilucs2,
-                                h3 = self.hilucs3
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        # Rule 24
-                        if rule_dict['tip_regula_id'] == 24:
-                            validation_passed = category_4.rule_24(
-                                rule = rule_dict,
-                                gdf = gdf
-                            )
-                            validation_passed_list.append(validation_passed)
-                    
-                        # Rule 25
-                        if rule_dict['tip_regula_id'] == 25:
-                            validation_passed = category_4.rule_25(
-                                rule = rule_dict,
-                                gdf = gdf,
-                                h1 = self.hilucs1,
-                                h2 = self.hilucs2,
-                                h3 = self.hilucs3
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        # Rule 26
-                        if rule_dict['tip_regula_id'] == 26:
-                            validation_passed = category_4.rule_26(
-                                rule = rule_dict,
-                                gdf = gdf
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        # Rule 27
-                        if rule_dict['tip_regula_id'] == 27:
-                            validation_passed = category_4.rule_27(
-                                rule = rule_dict,
-                                gdf = gdf
-                            )
-                            validation_passed_list.append(validation_passed)
-                            
-                        # Rule 28
-                        if rule_dict['tip_regula_id'] == 28:
-                            validation_passed = category_4.rule_28(
-                                rule = rule_dict,
-                                gdf = gdf
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        # Rule 29
-                        if rule_dict['tip_regula_id'] == 29:
-                            validation_passed = category_4.rule_29(
-                                rule = rule_dict,
-                                gdf = gdf
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        # Rule 30
-                        if rule_dict['tip_regula_id'] == 30:
-                            validation_passed = category_4.rule_30(
-                                rule = rule_dict,
-                                gdf = gdf
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        # Rule 31
-                        if rule_dict['tip_regula_id'] == 31:
-                            validation_passed = category_4.rule_31(
-                                rule = rule_dict,
-                                gdf = gdf
-                            )
-                            validation_passed_list.append(validation_passed)
-
-                        # Rule 32
-                        if rule_dict['tip_regula_id'] == 32:
-                            validation_passed = category_4.rule_32(
-                                rule = rule_dict,
-                                gdf = gdf
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        # Rule 33
-                        if rule_dict['tip_regula_id'] == 33:
-                            validation_passed = category_4.rule_33(
-                                rule = rule_dict,
-                                gdf = gdf
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        # Rule 34
-                        if rule_dict['tip_regula_id'] == 34:
-                            validation_passed = category_4.rule_34(
-                                rule = rule_dict,
-                                gdf = gdf
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        # Rule 35
-                        if rule_dict['tip_regula_id'] == 35:
-                            validation_passed = category_4.rule_35(
-                                rule = rule_dict,
-                                gdf = gdf
-                            )
-                            validation_passed_list.append(validation_passed)
-                            
-                        # Rule 36
-                        if rule_dict['tip_regula_id'] == 36:
-                            validation_passed = category_4.rule_36(
-                                rule = rule_dict,
-                                gdf = gdf
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        # Rule 37
-                        if rule_dict['tip_regula_id'] == 37:
-                            validation_passed = category_4.rule_37(
-                                rule = rule_dict,
-                                gdf = gdf
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        # Rule 38
-                        if rule_dict['tip_regula_id'] == 38:
-                            validation_passed = category_4.rule_38(
-                                rule = rule_dict,
-                                gdf = gdf
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        # Rule 39
-                        if rule_dict['tip_regula_id'] == 39:
-                            validation_passed = category_4.rule_39(
-                                rule = rule_dict,
-                                gdf = gdf,
-                                zfzrs = self.zfzrs
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        # Rule 40
-                        if rule_dict['tip_regula_id'] == 40:
-                            validation_passed = category_4.rule_40(
-                                rule = rule_dict,
-                                gdf = gdf
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        # Rule 41
-                        if rule_dict['tip_regula_id'] == 41:
-                            validation_passed = category_4.rule_41(
-                                rule = rule_dict,
-                                gdf = gdf
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        # Rule 42
-                        if rule_dict['tip_regula_id'] == 42:
-                            validation_passed = category_4.rule_42(
-                                rule = rule_dict,
-                                gdf = gdf
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        # Rule 43
-                        if rule_dict['tip_regula_id'] == 43:
-                            validation_passed = category_4.rule_43(
-                                rule = rule_dict,
-                                gdf = gdf
-                            )
-                            validation_passed_list.append(validation_passed)
-                            
-                        # Rule 44
-                        if rule_dict['tip_regula_id'] == 44:
-                            validation_passed = category_4.rule_44(
-                                rule = rule_dict,
-                                gdf = gdf
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        #  Rule 45
-                        if rule_dict['tip_regula_id'] == 45:
-                            validation_passed = category_4.rule_45(
-                                rule = rule_dict,
-                                gdf = gdf
-                            )
-                            validation_passed_list.append(validation_passed)
-                        
-                        #  Rule 46
-                        if rule_dict['tip_regula_id'] == 46:
-                            validation_passed = category_4.rule_46(
-                                rule = rule_dict,
-                                gdf = gdf
-                            )
-                            validation_passed_list.append(validation_passed)
-                    except:
-                        pass
+                        outcome = outcome.result()
+                    except Exception as e:
+                        # The rule never reported, a crashed worker or inputs that couldn't be sent fail it
+                        ReportWriter.write_error(rule=rule_dict, verify=str(e))
+                        validation_passed_list.append(False)
+                        continue
+                
+                completed, validation_passed, rows = outcome
+                ReportWriter.write_rows(rows)
+                if completed:
+                    validation_passed_list.append(validation_passed)
+        finally:
+            for pool in set(pools.values()):
+                pool.shutdown()
             
         if False in validation_passed_list:
             validation_progress = False
@@ -464,56 +238,75 @@ class Validation:
             validation_progress = True
         return validation_progress
     
-    def extract_data(zip_filepath):
-        with zipfile.ZipFile(zip_filepath, mode='r') as archive:
-            file_list = archive.namelist()
-            
-            # To get the main directory
-            main_directory = [folder.split('/')[0] for folder in file_list]
-            main_directory = list(dict.fromkeys(main_directory))
-            main_directory = list(filter(None, main_directory))
-            
-            folder_list = [folder.split('/')[1] for folder in file_list]
-            folder_list = list(dict.fromkeys(folder_list))
-            folder_list = list(filter(None, folder_list))
+    def schedule(self):
+        """Returns the rules that will run with their specs, in the order they appear in the report."""
+        tasks = []
+        rules_by_category = self.group_rules()
         
-            fisiere_list = [file.split('/', 2)[-1] for file in file_list]
-            fisiere_list = list(dict.fromkeys(fisiere_list))
-            fisiere_list = list(filter(None, fisiere_list))
+        for category in self.metadata.tip_validare_id.unique():
+            category = int(category)
             
-            avize = [item for item in fisiere_list if item.startswith("4_")]
-            avize = [item for item in avize if item != ""]
-        
-            pdf_list = []
-            for pdf in file_list:
+            for rule_dict in rules_by_category.get(category, []):
+                spec = RULE_REGISTRY.get(rule_dict['tip_regula_id'])
                 
-                if pdf.endswith(".pdf"):
-                    pdf_list.append(pdf)
-                    
-            pdfs_list = [pdf.split('/')[-1] for pdf in pdf_list]
-        
-            gpkg_list = []
-            for gpkg in file_list:
+                # Rules that are unknown or registered under another category are skipped
+                if spec is None or spec.category != category:
+                    continue
                 
-                if gpkg.endswith('.gpkg'):
-                    gpkg_list.append(gpkg)
-            
-            gpkg_list = [gpkg.split('/')[-1] for gpkg in gpkg_list]
+                tasks.append((spec, rule_dict))
         
-            temp_dir = tempfile.mkdtemp()
-            gpkg_path = []
+        return tasks
     
-            for gpkg in file_list:
-                
-                if gpkg.endswith('.gpkg'):
-                    gpkg_path.append(gpkg)
-            
-            for gpkg in gpkg_path:
-                archive.extract(gpkg, temp_dir)
-                
-            gpkg_file_path = os.path.join(temp_dir, gpkg)
-            layers = fiona.listlayers(gpkg_file_path)
-            gdf = {layer: gpd.read_file(gpkg_file_path, layer=layer) for layer in layers}
-            shutil.rmtree(temp_dir)
-            
-            return file_list, main_directory, folder_list, fisiere_list, avize, pdfs_list, gpkg_list, gdf
\ No newline at end of file
+    def read_columns(spec, rule_dict):
+        """Returns the layers and columns a rule reads, none if it reads no layer data."""
+        if spec.columns is None:
+            return {}
+        try:
+            return spec.columns(rule_dict)
+        except Exception:
+            # A malformed rule fails on its own, it doesn't need any data
+            return {}
+    
+    def projection(tasks_columns):
+        """Returns the layers and columns read by all the rules that will run."""
+        projection = {}
+        
+        for columns in tasks_columns:
+            merge_columns(projection, columns)
+        
+        return projection
+    
+    def create_pools(self):
+        """Creates the pools the rules are scheduled on, none if the rules run one after another."""
+        if self.max_workers <= 0:
+            return {}
+        
+        threads = ThreadPoolExecutor(max_workers=self.max_workers)
+        # Spawned workers, a fork could copy a GDAL lock held by one of the threads
+        processes = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn')) if self.use_processes else threads
+        return {'thread': threads, 'process': processes}
+    
+    def process_inputs(rule_inputs, columns):
+        """Returns the inputs of a rule sent to another process, the layers cut down to the columns it reads."""
+        rule_inputs = dict(rule_inputs)
+        if 'gdf' in rule_inputs:
+            rule_inputs['gdf'] = rule_inputs['gdf'].subset(columns)
+        return rule_inputs
+    
+    def group_rules(self):
+        """Returns the rules of the current validation type as records, grouped by category and sorted by number."""
+        rules = self.metadata[self.metadata['categorie_regula_id'] == int(self.tip_validare)]
+        
+        return {
+            int(category): category_rules.sort_values(by='numar_regula').to_dict('records')
+            for category, category_rules in rules.groupby('tip_validare_id', sort=False)
+        }
+    
+    def extract_data(archive, projection):
+        # The last gpkg of the archive is the one validated, read in place from the archive
+        geopackage = archive.geopackage(archive.gpkg_files[-1])
+        
+        # Every layer is listed for rules 16 and 17, a layer is only read when a rule asks for it
+        gdf = LayerDict(geopackage, projection)
+        
+        return gdf
@@ -1,12 +1,18 @@
 import os
 import csv
+import threading
 import pandas as pd
 import tempfile
+from contextlib import contextmanager
+from typing import Iterator, List
 
 # Set up temporary directory and raport file path
 REPORT_DIR = tempfile.gettempdir()
 REPORT_PATH = os.path.join(REPORT_DIR, 'report.csv')
 
+# Rows written by a thread while it is capturing
+_captured = threading.local()
+
 class ReportWriter:
     """Handles the creation and writing of report data to a CSV file."""
     
@@ -24,6 +30,35 @@ class ReportWriter:
             writer = csv.writer(file)
             writer.writerow(headers)
 
+    @staticmethod
+    @contextmanager
+    def capture() -> Iterator[List[list]]:
+        """Collects the rows written by the current thread instead of writing them to the CSV."""
+        rows = []
+        _captured.rows = rows
+        try:
+            yield rows
+        finally:
+            _captured.rows = None
+
+    @staticmethod
+    def write_rows(rows: List[list], path: str = REPORT_PATH) -> None:
+        """Writes previously captured rows to the CSV."""
+        with open(path, mode='a', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerows(rows)
+
+    @staticmethod
+    def _write_row(row: list, path: str) -> None:
+        """Writes a single row to the CSV or to the capture of the current thread."""
+        rows = getattr(_captured, 'rows', None)
+        if rows is not None:
+            rows.append(row)
+            return
+        with open(path, mode='a', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(row)
+
     @staticmethod
     def _format_alert_type(alert_type: str) -> str:
         """Converts numeric alert type to human-readable string."""
@@ -45,9 +80,7 @@ class ReportWriter:
             "-",
             "-"
         ]
-        with open(path, mode='a', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(row)
+        ReportWriter._write_row(row, path)
 
     @staticmethod
     def write_fail(rule: pd.DataFrame, verify: str = "-", path: str = REPORT_PATH) -> None:
@@ -61,9 +94,7 @@ class ReportWriter:
             rule['mesaj_modificare'],
             verify
         ]
-        with open(path, mode='a', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(row)
+        ReportWriter._write_row(row, path)
 
     @staticmethod
     def write_error(rule: pd.DataFrame, verify: str = "-", path: str = REPORT_PATH) -> None:
@@ -77,6 +108,4 @@ class ReportWriter:
             rule['eroare_modificare'],
             verify
         ]
-        with open(path, mode='a', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(row)
\ No newline at end of file
+        ReportWriter._write_row(row, path)
\ No newline at end of file
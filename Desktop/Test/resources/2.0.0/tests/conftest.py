@@ -0,0 +1,14 @@
+import sys
+from pathlib import Path
+
+# The extras package is imported from the folder of the version, the way the app runs it
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+from support import write_archive
+
+@pytest.fixture
+def archive_path(tmp_path):
+    """An archive laid out like a PUG, with a gpkg, two pdfs and an aviz."""
+    return write_archive(tmp_path / 'arhiva.zip')
@@ -0,0 +1,86 @@
+import csv
+import zipfile
+import pandas as pd
+import geopandas as gpd
+from shapely.geometry import box
+
+from extras.writer import REPORT_PATH, ReportWriter
+
+# The member the gpkg of the test archives is written to
+GPKG_MEMBER = 'PUG_X/1_Date/PUG_123.gpkg'
+
+# A pdf is recognized by its leading bytes, the rest is padding
+PDF = b'%PDF-1.4\n' + b'x' * 20000
+
+def make_layers():
+    """The layers of the gpkg of the test archives."""
+    crs = 'EPSG:3844'
+    return {
+        'UTR': gpd.GeoDataFrame({
+            'Cod': ['A1', 'A2', 'A1'],
+            'Tip': ['Zona unu', None, 'Zona doi'],
+            'Suprafata': [0.01, 0.01, 0.02]
+        }, geometry=[box(0, 0, 10, 10), box(10, 0, 20, 10), box(20, 0, 40, 10)], crs=crs),
+        'Ref': gpd.GeoDataFrame({'Cod': ['A1', 'Q'], 'Tip': ['Zona unu', 'Q']}, geometry=[box(0, 0, 1, 1)] * 2, crs=crs)
+    }
+
+def write_archive(path, layers=None, members=None, gpkg_member=GPKG_MEMBER):
+    """Writes a zip with the layers in a gpkg member, the other members are written as they are given.
+
+    No layers write no gpkg.
+    """
+    layers = make_layers() if layers is None else layers
+    members = {
+        'PUG_X/': b'',
+        'PUG_X/1_Date/': b'',
+        'PUG_X/2_Piese/': b'',
+        'PUG_X/4_Avize/': b'',
+        'PUG_X/2_Piese/memoriu.pdf': PDF,
+        'PUG_X/2_Piese/fals.pdf': b'not a pdf at all',
+        'PUG_X/4_Avize/4_aviz1.pdf': PDF
+    } if members is None else members
+
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for member, data in members.items():
+            archive.writestr(member, data)
+
+        if layers:
+            gpkg_path = path.with_suffix('.gpkg')
+            for layer, frame in layers.items():
+                frame.to_file(gpkg_path, layer=layer, driver='GPKG')
+            archive.write(gpkg_path, gpkg_member)
+    return str(path)
+
+def make_vocabularies():
+    """The zfzrs and the three HILUCS levels a validation is given."""
+    return (
+        pd.DataFrame({'definitie': ['A1', 'A2', 'Q'], 'definite_lung': ['Zona unu', 'Zona doi', 'Q']}),
+        pd.DataFrame({'definitie': ['1_Prod', '2_Sec']}),
+        pd.DataFrame({'definitie': ['1_1_A', '2_2_B']}),
+        pd.DataFrame({'definitie': ['1_1_1_A']})
+    )
+
+def make_rule(formula='', value='', number=1, alert=1):
+    return {
+        'numar_regula': number, 'tip_alerta_id': alert, 'formula_regula': formula, 'valoare_regula': value,
+        'descriere': '', 'pass_alerta': '', 'fail_alerta': '', 'mesaj_modificare': '', 'error_alerta': '', 'eroare_modificare': ''
+    }
+
+def make_metadata(rules, validation_type=1):
+    """The metadata of the rules, given as (tip_validare_id, tip_regula_id, formula_regula, valoare_regula) and numbered in order."""
+    return pd.DataFrame([
+        dict(make_rule(formula, value, number=i + 1), tip_validare_id=category, categorie_regula_id=validation_type, tip_regula_id=rule_type)
+        for i, (category, rule_type, formula, value) in enumerate(rules)
+    ])
+
+def run_rule(category, handler, rule, **inputs):
+    """Runs a rule and returns its status and what it reported."""
+    with ReportWriter.capture() as rows:
+        handler(category, rule=rule, **inputs)
+    assert len(rows) == 1
+    return rows[0][1], rows[0][6]
+
+def read_report():
+    """The rows of the last report, without its headers."""
+    with open(REPORT_PATH, newline='') as file:
+        return list(csv.reader(file))[1:]
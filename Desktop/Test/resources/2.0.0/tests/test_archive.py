@@ -0,0 +1,79 @@
+import pickle
+import zipfile
+import pytest
+
+from extras.archive import ArchiveIndex
+from support import PDF, write_archive
+
+# Archives laid out the ways the rules of category 2 have to tell apart
+ARCHIVES = {
+    'pug': None,
+    'without_folder_entries': {
+        'PUG_X/2_Piese/memoriu.pdf': PDF,
+        'PUG_X/4_Avize/4_aviz1.pdf': PDF,
+        'PUG_X/4_Avize/sub/4_aviz2.pdf': PDF
+    },
+    'two_main_directories': {
+        'PUG_X/': b'',
+        'PUG_Y/2_Piese/memoriu.pdf': PDF,
+        'PUG_Y/2_Piese/PLAN.PDF': PDF
+    }
+}
+
+def old_lists(zip_path):
+    """The lists extract_data built from the names of the archive before the index."""
+    with zipfile.ZipFile(zip_path, mode='r') as archive:
+        file_list = archive.namelist()
+    main_directory = list(filter(None, dict.fromkeys([folder.split('/')[0] for folder in file_list])))
+    folder_list = list(filter(None, dict.fromkeys([folder.split('/')[1] for folder in file_list])))
+    fisiere_list = list(filter(None, dict.fromkeys([file.split('/', 2)[-1] for file in file_list])))
+    avize = [item for item in fisiere_list if item.startswith("4_")]
+    pdfs_list = [pdf.split('/')[-1] for pdf in file_list if pdf.endswith(".pdf")]
+    gpkg_list = [gpkg.split('/')[-1] for gpkg in file_list if gpkg.endswith('.gpkg')]
+    return file_list, main_directory, folder_list, fisiere_list, avize, pdfs_list, gpkg_list
+
+@pytest.mark.parametrize('name', list(ARCHIVES))
+def test_index_matches_the_lists_of_the_archive(tmp_path, name):
+    zip_path = write_archive(tmp_path / 'arhiva.zip', members=ARCHIVES[name])
+    file_list, main_directory, folder_list, fisiere_list, avize, pdfs_list, gpkg_list = old_lists(zip_path)
+
+    with ArchiveIndex(zip_path) as archive:
+        assert archive.exists and archive.is_zip
+        assert archive.file_list == file_list
+        assert archive.names == set(file_list)
+        assert archive.main_directory == main_directory
+        assert archive.folder_list == folder_list
+        assert archive.fisiere_list == fisiere_list
+        assert archive.avize_list == avize
+        assert archive.pdfs_list == pdfs_list
+        assert [gpkg.split('/')[-1] for gpkg in archive.gpkg_files] == gpkg_list
+        assert archive.pdf_files == [name for name in file_list if name.lower().endswith('.pdf')]
+
+@pytest.mark.parametrize('content', [None, b'not a zip'])
+def test_index_of_a_missing_or_broken_archive(tmp_path, content):
+    zip_path = tmp_path / 'arhiva.zip'
+    if content is not None:
+        zip_path.write_bytes(content)
+
+    with ArchiveIndex(str(zip_path)) as archive:
+        assert archive.exists == (content is not None)
+        assert not archive.is_zip
+        assert archive.zip_file is None
+        assert archive.file_list == archive.pdf_files == archive.gpkg_files == []
+
+def test_index_reads_the_members_of_the_archive(archive_path):
+    with zipfile.ZipFile(archive_path) as archive:
+        members = {name: archive.read(name) for name in archive.namelist() if name.endswith('.pdf')}
+
+    with ArchiveIndex(archive_path) as archive:
+        assert archive.read_header('PUG_X/2_Piese/memoriu.pdf', size=4) == b'%PDF'
+        assert archive.read_headers(list(members), size=len(PDF)) == members
+
+def test_pickled_index_reopens_the_archive(archive_path):
+    with ArchiveIndex(archive_path) as archive:
+        archive.zip_file
+        copy = pickle.loads(pickle.dumps(archive))
+
+    assert copy._zip_file is None
+    assert copy.read_header('PUG_X/2_Piese/memoriu.pdf', size=4) == b'%PDF'
+    copy.close()
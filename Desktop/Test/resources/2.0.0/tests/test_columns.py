@@ -0,0 +1,71 @@
+import pickle
+import numpy as np
+import pandas as pd
+import pytest
+
+from extras.columns import ColumnCache, compiled, match_mask
+
+def test_patterns_are_compiled_once():
+    assert compiled(r'^\d+$') is compiled(r'^\d+$')
+
+@pytest.mark.parametrize('column', [
+    pd.Series([], dtype=object),
+    pd.Series([], dtype=int),
+    pd.Series([], dtype=float),
+    pd.Series([], dtype='datetime64[ms]')
+])
+def test_match_mask_of_an_empty_column(column):
+    assert match_mask(column, r'^\d+$').tolist() == []
+
+def test_match_mask_matches_the_text_of_every_value():
+    column = pd.Series([' 12 ', 12, 1.5, None, np.nan, 'a'], dtype=object)
+
+    assert match_mask(column, r'^\d+$', strip=True).tolist() == [True, True, False, False, False, False]
+    assert match_mask(column, r'^\d+$').tolist() == [False, True, False, False, False, False]
+
+class CountingLayers(dict):
+    """Layers that count how many times a column is read."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reads = 0
+
+    def __getitem__(self, layer):
+        self.reads += 1
+        return super().__getitem__(layer)
+
+@pytest.fixture
+def gdf():
+    return CountingLayers({'UTR': pd.DataFrame({
+        'Data': ['2020-01-01', ' 2999-01-01 ', None, 'x'],
+        'Cod': ['A', 'B', 'C', 'D'],
+        'Nr': [1, 2, 3, 4]
+    })})
+
+def test_convert_parses_text_as_dates(gdf):
+    column_cache = ColumnCache(gdf)
+    dates = column_cache.convert('UTR', 'Data', 'datetime64[ms]')
+
+    assert dates.dtype == 'datetime64[ms]'
+    assert dates[:2].tolist() == [pd.Timestamp('2020-01-01'), pd.Timestamp('2999-01-01')]
+    assert dates[2:].isna().all()
+    # The layer keeps its text
+    assert gdf['UTR']['Data'].dtype == 'O'
+
+def test_convert_leaves_other_columns_as_they_are(gdf):
+    assert ColumnCache(gdf).convert('UTR', 'Nr', 'datetime64[ms]').dtype == 'int64'
+
+def test_convert_converts_a_column_once(gdf):
+    column_cache = ColumnCache(gdf)
+    first = column_cache.convert('UTR', 'Data', 'datetime64[ms]')
+    reads = gdf.reads
+
+    assert column_cache.convert('UTR', 'Data', 'datetime64[ms]') is first
+    assert gdf.reads == reads
+
+def test_pickled_cache_keeps_its_columns(gdf):
+    column_cache = ColumnCache(dict(gdf))
+    column_cache.convert('UTR', 'Data', 'datetime64[ms]')
+
+    copy = pickle.loads(pickle.dumps(column_cache))
+    pd.testing.assert_series_equal(copy.convert('UTR', 'Data', 'datetime64[ms]'), column_cache.convert('UTR', 'Data', 'datetime64[ms]'))
@@ -0,0 +1,262 @@
+import base64
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+
+from extras import database
+from extras.database import TOKEN_LEEWAY, APIClient, AuthManager, CacheManager, ConfigManager, MetadataCache, token_expiry
+
+# The rows every metadata endpoint answers with
+TABLES = {
+    '/rules?ver=2.0.0&cat=1': [{'numar_regula': 1, 'tip_regula_id': 1, 'valoare_regula': 'UTR'}],
+    '/zfzrs': [{'definitie': 'ZF1', 'definite_lung': 'Zona unu'}],
+    '/hilucs1': [{'definitie': '1_Prod'}],
+    '/hilucs2': [{'definitie': '1_1_A'}],
+    '/hilucs3': [{'definitie': '1_1_1_A'}]
+}
+
+def make_token(claims):
+    """A JWT with the claims, its header and signature are never read locally."""
+    payload = base64.urlsafe_b64encode(json.dumps(claims).encode()).decode().rstrip('=')
+    return f'header.{payload}.signature'
+
+class FakeResponse:
+    def __init__(self, headers=None, status_code=200, rows=None):
+        self.headers = headers or {}
+        self.status_code = status_code
+        self.rows = rows
+
+    def json(self):
+        return self.rows
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f'{self.status_code} Error')
+
+class FakeSession:
+    """Answers the metadata endpoints, holding every request until the expected number of them arrived together."""
+
+    def __init__(self, parallel):
+        self.requests = []
+        self._barrier = threading.Barrier(parallel, timeout=5)
+
+    def get(self, url, headers, timeout):
+        self.requests.append((url, headers))
+        self._barrier.wait()
+        if headers.get('If-None-Match') == '"1"':
+            return FakeResponse(status_code=304)
+        return FakeResponse({'ETag': '"1"'}, rows=TABLES[url[len('http://server'):]])
+
+@pytest.fixture
+def config(tmp_path):
+    path = tmp_path / 'config.ini'
+    path.write_text(
+        '[PROVIDER]\ngraphit = http://server\n\n'
+        '[LOGIN]\nrefresh = /refresh\n\n'
+        '[METADATA]\nrules = /rules?ver=V&cat=C\nzfzrs = /zfzrs\nhilucs1 = /hilucs1\nhilucs2 = /hilucs2\nhilucs3 = /hilucs3\n\n'
+        '[VALIDATOR]\nversion = 2.0.0\n\n'
+        f'[CACHE]\nfolder = {tmp_path / "cache"}\nttl = 3600\n'
+    )
+    return ConfigManager(str(path))
+
+@pytest.fixture
+def cache(config, tmp_path):
+    return MetadataCache(config, str(tmp_path / 'cache'))
+
+def test_tables_are_stored_and_loaded(config, cache):
+    frame = pd.DataFrame({'definitie': ['a', 'b'], 'id': [1, 2]})
+    cache.store('zfzrs', frame, FakeResponse({'ETag': '"1"', 'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT'}))
+    cache.save()
+
+    cache = MetadataCache(config, str(cache.cache_dir.parent))
+    pd.testing.assert_frame_equal(cache.load('zfzrs'), frame)
+    assert cache.is_fresh('zfzrs')
+    assert cache.validators('zfzrs') == {'If-None-Match': '"1"', 'If-Modified-Since': 'Mon, 01 Jan 2024 00:00:00 GMT'}
+
+def test_mixed_object_columns_are_stored(config, cache):
+    frame = pd.DataFrame({
+        'valoare_regula': ['UTR', 5, None, 2.5, np.nan],
+        'ids': pd.Series([1, None, 2, 3, 4], dtype=object),
+        'text': ['a', None, 'b', 'c', 'd']
+    })
+    cache.store('rules_1', frame, FakeResponse())
+    cache.save()
+
+    loaded = MetadataCache(config, str(cache.cache_dir.parent)).load('rules_1')
+    assert loaded.dtypes.to_dict() == frame.dtypes.to_dict()
+    assert loaded['valoare_regula'].tolist()[:4] == ['UTR', 5, None, 2.5]
+    assert np.isnan(loaded['valoare_regula'][4])
+    assert loaded['ids'].tolist() == [1, None, 2, 3, 4]
+    assert loaded['text'].tolist() == ['a', None, 'b', 'c', 'd']
+
+def test_table_is_stale_after_the_ttl(cache):
+    cache.store('zfzrs', pd.DataFrame({'definitie': ['a']}), FakeResponse())
+    cache._index['zfzrs']['fetched_at'] -= cache.ttl + 1
+    assert not cache.is_fresh('zfzrs')
+
+    cache.touch('zfzrs')
+    assert cache.is_fresh('zfzrs')
+
+def test_missing_tables(cache):
+    assert cache.load('zfzrs') is None
+    assert not cache.is_fresh('zfzrs')
+    assert cache.validators('zfzrs') == {}
+
+@pytest.fixture
+def client(config, monkeypatch):
+    client = APIClient(config, AuthManager(config))
+    client.token_checks = 0
+
+    def renew_token():
+        client.token_checks += 1
+        return 'token'
+
+    monkeypatch.setattr(client.auth, 'renew_token', renew_token)
+    return client
+
+def fetch(client, monkeypatch, parallel):
+    """Gets the metadata of category 1 over a new fake session, returning the frames and the requests made."""
+    session = FakeSession(parallel)
+    monkeypatch.setattr(database, 'get_session', lambda: session)
+    return client.get_metadata(1), session.requests
+
+def test_metadata_tables_are_fetched_together(client, monkeypatch):
+    # The five requests are only answered once they are all waiting at the same time
+    frames, requests_made = fetch(client, monkeypatch, parallel=5)
+
+    for frame, rows in zip(frames, TABLES.values()):
+        pd.testing.assert_frame_equal(frame, pd.json_normalize(rows))
+    assert sorted(url for url, _ in requests_made) == sorted(f'http://server{path}' for path in TABLES)
+    assert all(headers['Authorization'] == 'JWT token' for _, headers in requests_made)
+    assert client.token_checks == 1
+
+def test_fresh_tables_are_read_from_the_cache(client, monkeypatch):
+    first, _ = fetch(client, monkeypatch, parallel=5)
+    frames, requests_made = fetch(client, monkeypatch, parallel=1)
+
+    assert requests_made == []
+    assert client.token_checks == 1
+    for frame, cached in zip(frames, first):
+        pd.testing.assert_frame_equal(frame, cached)
+
+def test_stale_tables_are_revalidated(client, config, monkeypatch):
+    first, _ = fetch(client, monkeypatch, parallel=5)
+    config.config['CACHE']['ttl'] = '0'
+    frames, requests_made = fetch(client, monkeypatch, parallel=5)
+
+    # The server answers 304 to the ETag of every table, the cached tables are used
+    assert all(headers['If-None-Match'] == '"1"' for _, headers in requests_made)
+    assert client.token_checks == 2
+    for frame, cached in zip(frames, first):
+        pd.testing.assert_frame_equal(frame, cached)
+
+def test_fresh_table_needs_no_token(config, cache):
+    frame = pd.DataFrame({'definitie': ['a']})
+    cache.store('zfzrs', frame, FakeResponse())
+
+    def token():
+        raise AssertionError('the token was checked')
+
+    client = APIClient(config, AuthManager(config))
+    pd.testing.assert_frame_equal(client._get_table(cache, 'zfzrs', 'http://server/zfzrs', token), frame)
+
+def test_requests_share_one_session():
+    assert database.get_session() is database.get_session()
+
+def test_token_expiry():
+    assert token_expiry(make_token({'exp': 1700000000})) == 1700000000
+    # base64url payloads come without their padding
+    assert token_expiry(make_token({'exp': 1, 'sub': 'ab'})) == 1
+
+@pytest.mark.parametrize('token', ['', 'not a token', 'a.b.c', make_token({'sub': 'x'}), None])
+def test_token_expiry_unreadable(token):
+    assert token_expiry(token) is None
+
+def test_token_is_renewed_within_the_leeway(config):
+    auth = AuthManager(config)
+
+    assert auth.is_valid(make_token({'exp': time.time() + TOKEN_LEEWAY * 2}))
+    assert not auth.is_valid(make_token({'exp': time.time() + TOKEN_LEEWAY / 2}))
+    assert not auth.is_valid('not a token')
+
+class RejectingSession:
+    """Rejects the requests made with the tokens it is given, or with any token if it is given none."""
+
+    def __init__(self, rejected=None):
+        self.rejected = rejected
+        self.tokens = []
+
+    def get(self, url, headers, timeout):
+        token = headers['Authorization'].split(' ')[1]
+        self.tokens.append(token)
+        rejected = self.rejected is None or token in self.rejected
+        return FakeResponse(status_code=401 if rejected else 200, rows=[])
+
+@pytest.fixture
+def auth(config, tmp_path, monkeypatch):
+    """An AuthManager whose refresh call gives a new token, keeping the tokens it issued."""
+    auth = AuthManager(config)
+    auth.cache = CacheManager(str(tmp_path / 'cache.json'))
+    auth.cache.update_tokens(make_token({'exp': time.time() + 3600}), 'refresh')
+    auth.issued = []
+
+    def refresh(refresh_url, refresh_token):
+        # Slow enough for the other rejected requests to wait on the lock
+        time.sleep(0.05)
+        token = make_token({'exp': time.time() + 3600, 'jti': len(auth.issued)})
+        auth.issued.append(token)
+        auth.cache.update_tokens(token, 'refresh')
+        return token
+
+    monkeypatch.setattr(auth, '_refresh', refresh)
+    return auth
+
+def test_renewed_token_is_used_without_asking_the_server(auth, monkeypatch):
+    def make_request(*args):
+        raise AssertionError('the server was asked')
+
+    monkeypatch.setattr(auth, '_make_request', make_request)
+    assert auth.renew_token() == auth.cache.get_tokens()[0]
+
+def test_rejected_token_is_refreshed_and_the_request_tried_again(config, auth, monkeypatch):
+    token = auth.cache.get_tokens()[0]
+    session = RejectingSession({token})
+    monkeypatch.setattr(database, 'get_session', lambda: session)
+
+    assert APIClient(config, auth)._get_authorized('http://server/zfzrs').status_code == 200
+    assert session.tokens == [token, *auth.issued]
+    assert len(auth.issued) == 1
+
+def test_token_rejected_after_a_refresh_fails_the_request(config, auth, monkeypatch):
+    # The server rejects the refreshed token as well
+    session = RejectingSession()
+    monkeypatch.setattr(database, 'get_session', lambda: session)
+
+    with pytest.raises(requests.HTTPError):
+        APIClient(config, auth)._get_authorized('http://server/zfzrs')
+    assert len(auth.issued) == 1
+
+def test_token_that_cannot_be_refreshed(config, auth, monkeypatch):
+    session = RejectingSession({auth.cache.get_tokens()[0]})
+    monkeypatch.setattr(database, 'get_session', lambda: session)
+    auth.cache.update_tokens(auth.cache.get_tokens()[0], '')
+
+    with pytest.raises(PermissionError):
+        APIClient(config, auth)._get_authorized('http://server/zfzrs')
+    assert auth.issued == []
+
+def test_requests_rejected_together_refresh_once(config, auth, monkeypatch):
+    session = RejectingSession({auth.cache.get_tokens()[0]})
+    monkeypatch.setattr(database, 'get_session', lambda: session)
+    client = APIClient(config, auth)
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        responses = list(pool.map(lambda _: client._get_authorized('http://server/zfzrs'), range(5)))
+
+    assert [response.status_code for response in responses] == [200] * 5
+    assert len(auth.issued) == 1
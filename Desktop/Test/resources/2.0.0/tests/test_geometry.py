@@ -0,0 +1,53 @@
+import pickle
+import geopandas as gpd
+import pytest
+import shapely
+from shapely.geometry import Polygon, box
+
+from extras.geometry import UnionCache, union
+
+# Layers that are a coverage, that overlap, that leave gaps, and ones with missing or no geometries
+LAYERS = {
+    'coverage': [box(x, y, x + 10, y + 10) for x in range(0, 100, 10) for y in range(0, 50, 10)],
+    'overlapping': [box(0, 0, 10, 10), box(5, 5, 15, 15), box(20, 0, 30, 10)],
+    'gaps': [box(0, 0, 10, 10), box(11, 0, 20, 10), Polygon([(20, 0), (30, 0), (25, 10)])],
+    'missing': [box(0, 0, 10, 10), None, box(10, 0, 20, 10)],
+    'empty': []
+}
+
+@pytest.mark.parametrize('name', list(LAYERS))
+def test_union_matches_the_unary_union(name):
+    geometries = gpd.GeoSeries(LAYERS[name])
+    merged = union(geometries.values)
+    # The unary_union rule 34 measured before, under its current name
+    expected = geometries.union_all()
+
+    assert merged.is_valid
+    assert merged.area == pytest.approx(expected.area)
+    assert shapely.symmetric_difference(merged, expected).area == pytest.approx(0)
+
+class CountingLayers(dict):
+    """Layers that count how many times they are read."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reads = 0
+
+    def __getitem__(self, layer):
+        self.reads += 1
+        return super().__getitem__(layer)
+
+def test_union_of_a_layer_is_computed_once():
+    gdf = CountingLayers({name: gpd.GeoDataFrame(geometry=geometries) for name, geometries in LAYERS.items()})
+    unions = UnionCache(gdf)
+
+    assert unions['coverage'] is unions['coverage']
+    assert gdf.reads == 1
+    assert list(unions) == ['coverage']
+
+def test_pickled_unions_are_kept():
+    unions = UnionCache({'overlapping': gpd.GeoDataFrame(geometry=LAYERS['overlapping'])})
+    unions['overlapping']
+
+    copy = pickle.loads(pickle.dumps(unions))
+    assert copy['overlapping'].equals(unions['overlapping'])
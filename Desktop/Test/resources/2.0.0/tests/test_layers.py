@@ -0,0 +1,133 @@
+import pickle
+import zipfile
+import fiona
+import geopandas as gpd
+import pytest
+from geopandas.testing import assert_geodataframe_equal
+from shapely.geometry import Point
+
+from extras.layers import GeoPackage, LayerDict
+from support import GPKG_MEMBER, make_layers, write_archive
+
+@pytest.fixture
+def extracted(archive_path, tmp_path):
+    """The gpkg extracted from the archive, the way extract_data read it before /vsizip/."""
+    with zipfile.ZipFile(archive_path) as archive:
+        return archive.extract(GPKG_MEMBER, tmp_path / 'extracted')
+
+def test_geopackage_is_read_inside_the_archive(archive_path, extracted):
+    geopackage = GeoPackage(archive_path, GPKG_MEMBER)
+
+    assert geopackage.path.startswith('/vsizip/{') and geopackage.path.endswith('}/' + GPKG_MEMBER)
+    assert geopackage.layers == fiona.listlayers(extracted)
+    assert geopackage.driver == 'GPKG'
+
+def test_layers_match_the_extracted_gpkg(archive_path, extracted):
+    geopackage = GeoPackage(archive_path, GPKG_MEMBER)
+
+    for layer in geopackage.layers:
+        assert_geodataframe_equal(geopackage.read_layer(layer), gpd.read_file(extracted, layer=layer, engine='fiona'))
+
+@pytest.mark.parametrize('name', ['arhiva v2.zip', 'arhiva.data', 'arhiva {1}.zip'])
+def test_geopackage_of_any_archive_name(tmp_path, name):
+    zip_path = write_archive(tmp_path / name)
+
+    assert GeoPackage(zip_path, GPKG_MEMBER).layers == list(make_layers())
+
+@pytest.mark.parametrize('columns', [{'Cod'}, {'Cod', 'Tip'}, set()])
+def test_layer_is_read_with_the_columns_asked_for(archive_path, columns):
+    geopackage = GeoPackage(archive_path, GPKG_MEMBER)
+    layer = geopackage.read_layer('UTR')
+
+    assert_geodataframe_equal(geopackage.read_layer('UTR', columns), layer[sorted(columns) + ['geometry']])
+
+def test_layers_of_the_projection_are_read_together(archive_path):
+    geopackage = GeoPackage(archive_path, GPKG_MEMBER)
+    frames = geopackage.read_layers({'UTR': {'Tip'}, 'Ref': None, 'Linii': {'Cod'}})
+
+    assert list(frames) == ['UTR', 'Ref']
+    assert_geodataframe_equal(frames['UTR'], geopackage.read_layer('UTR', {'Tip'}))
+    assert_geodataframe_equal(frames['Ref'], geopackage.read_layer('Ref'))
+    assert geopackage.read_layers({}) == {}
+
+class FakeGeoPackage:
+    """A GeoPackage whose layers are built in memory, counting how many times each one is read."""
+
+    layers = ['UTR', 'Ref']
+
+    def __init__(self):
+        self.reads = {}
+
+    def read_layer(self, layer, columns=None):
+        self.reads[layer] = self.reads.get(layer, 0) + 1
+        frame = gpd.GeoDataFrame({'Cod': ['A', 'B'], 'Tip': ['x', 'y']}, geometry=[Point(0, 0), Point(1, 1)])
+        return frame if columns is None else frame[[column for column in frame.columns if column in columns]]
+
+    def read_layers(self, projection):
+        return {layer: self.read_layer(layer, columns) for layer, columns in projection.items()}
+
+@pytest.fixture
+def geopackage():
+    return FakeGeoPackage()
+
+def test_layers_are_read_once_when_asked_for(geopackage):
+    gdf = LayerDict(geopackage, {'UTR': {'Cod', 'geometry'}})
+
+    assert list(gdf) == ['UTR', 'Ref']
+    assert geopackage.reads == {}
+    assert gdf['UTR'] is gdf['UTR']
+    assert list(gdf['UTR'].columns) == ['Cod', 'geometry']
+    assert geopackage.reads == {'UTR': 1}
+
+def test_unknown_layer(geopackage):
+    with pytest.raises(KeyError):
+        LayerDict(geopackage)['Linii']
+
+def test_layer_is_evicted_once_its_last_reader_releases_it(geopackage):
+    gdf = LayerDict(geopackage)
+    gdf.retain({'UTR': 2})
+    gdf['UTR']
+
+    gdf.release(['UTR'])
+    gdf['UTR']
+    assert geopackage.reads == {'UTR': 1}
+
+    gdf.release(['UTR'])
+    gdf['UTR']
+    assert geopackage.reads == {'UTR': 2}
+
+def test_layers_are_kept_without_readers(geopackage):
+    gdf = LayerDict(geopackage)
+    gdf['UTR']
+    gdf['Ref']
+    gdf.retain({'UTR': 1})
+
+    # Only the layers the rules were counted for are evicted
+    gdf.release(['UTR', 'Ref'])
+    gdf.release(['UTR'])
+    gdf['Ref']
+    assert geopackage.reads == {'UTR': 1, 'Ref': 1}
+
+def test_prefetch_reads_the_projection(geopackage):
+    gdf = LayerDict(geopackage, {'Ref': {'Tip'}})
+    gdf.prefetch()
+    gdf['Ref']
+
+    assert geopackage.reads == {'Ref': 1}
+
+def test_subset_keeps_the_columns_of_the_projection(geopackage):
+    frames = LayerDict(geopackage).subset({'UTR': {'Cod'}, 'Ref': set(), 'Linii': None})
+
+    assert list(frames) == ['UTR', 'Ref']
+    assert list(frames['UTR'].columns) == ['Cod']
+    assert list(frames['Ref'].columns) == ['geometry']
+
+def test_pickled_layers_are_read_again(geopackage):
+    gdf = LayerDict(geopackage)
+    gdf['UTR']
+    gdf.retain({'UTR': 1})
+
+    copy = pickle.loads(pickle.dumps(gdf))
+    assert copy._loaded == {} and copy._readers == {}
+    copy['UTR']
+    assert copy.geopackage.reads == {'UTR': 2}
@@ -0,0 +1,640 @@
+import os
+import re
+import tempfile
+import zipfile
+import filetype
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import pytest
+from shapely.geometry import LineString, Point, Polygon, box
+
+from extras import rules
+from extras.archive import ArchiveIndex
+from extras.columns import ColumnCache, Vocabularies
+from extras.geometry import UnionCache
+from extras.rules import DATE_2_PATTERN, DATE_PATTERN, DECIMALS_PATTERN, HCL_PATTERN, CategoryTwo, CategoryThree, CategoryFour
+from support import PDF, make_rule, run_rule, write_archive
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 100
+
+# The columns every rule is checked on, with the empty cells and dtypes the layers can be read with
+COLUMNS = {
+    'text': pd.Series(['A1', None, 'A2', np.nan, '', 'A1', 'NULL', 'A1']),
+    'dates_text': pd.Series(['2020-01-01', None, '2020-13-01', ' 2021-02-03 ', '2020-01-01 00:00:00', 'x']),
+    'dates': pd.Series(pd.to_datetime(['2020-01-01', None, '2021-02-03', '2020-01-01'])).astype('datetime64[ms]'),
+    'floats': pd.Series([1.5, np.nan, 2.0, 1.5, np.nan]),
+    'ints': pd.Series([1, 2, 2, 3]),
+    'mixed': pd.Series(['1', 1, 1.0, None, 'A1'], dtype=object),
+    'numbers_text': pd.Series(['12', ' 12', '1.25', '1.255', '.5', '12/01.02.2020', ' 1/31.12.2020 ', '1234567']),
+    'empty_text': pd.Series([], dtype=object),
+    'empty_floats': pd.Series([], dtype=float),
+    'empty_ints': pd.Series([], dtype=int),
+    'empty_dates': pd.Series([], dtype='datetime64[ms]'),
+}
+
+CODES = pd.DataFrame({'definitie': ['A1', 'A2', 1]})
+
+# The three HILUCS levels and the combinations of them rule 25 has to tell apart
+HILUCS = Vocabularies(
+    CODES,
+    pd.DataFrame({'definitie': ['1_Prod', '2_Sec']}),
+    pd.DataFrame({'definitie': ['1_1_A', '2_2_B', '2_1_C']}),
+    pd.DataFrame({'definitie': ['1_1_1_A', '2_2_1_B']})
+)
+HILUCS_LAYER = pd.DataFrame([
+    ('1_Prod', '1_1_A', '1_1_1_A'),
+    ('1_Prod', None, None),
+    ('2_Sec', '2_2_B', None),
+    ('2_Sec', '1_1_A', None),
+    ('2_Sec', '2_1_C', '2_2_1_B'),
+    ('X', '9_9', '1_1_1_A'),
+    (None, None, None),
+    (None, '1_1_A', '2_2_1_B'),
+    ('1_Prod', '1_1_A', '1_1_1_B')
+], columns=['H1', 'H2', 'H3'])
+
+# Geometries of every kind the geometry rules tell apart
+GEOMETRIES = [
+    box(0, 0, 10, 10),
+    None,
+    Polygon([(0, 0), (10, 10), (10, 0), (0, 10)]),
+    box(0, 0, 1e-4, 1e-3),
+    Polygon([(0, 0), (1, 0), (2, 0)]),
+    Polygon(),
+    LineString([(0, 0, 1), (1, 1, 1)]),
+    Point(1, 1),
+    box(5, 5, 15, 15)
+]
+
+def geometry_layers():
+    """The geometries whole, without the NULL ones and none of them, each as a layer."""
+    return {
+        'all': gpd.GeoDataFrame(geometry=GEOMETRIES),
+        'not_null': gpd.GeoDataFrame(geometry=[geom for geom in GEOMETRIES if geom is not None]),
+        'empty': gpd.GeoDataFrame(geometry=[])
+    }
+
+# The long names of the zfzrs codes rule 39 compares the layers with, a code keeps the name of its first row
+ZFZRS = pd.DataFrame({'definitie': ['ZF1', 'ZF2', 'ZF1', 'ZF3'], 'definite_lung': ['Zona unu ', 'Zona \u0163', 'Alta', 'Zona \u015F']})
+
+# The codes and types rule 46 looks the zones up in
+REFERENCE = pd.DataFrame({'Cod': ['A1', 'A2', 'A3'], 'Tip': ['Zona doi', ' Zona x', 'Zona doi']})
+
+# The validity dates of the plans, before, around and after today, and missing
+VALIDITY = pd.DataFrame({
+    'Data_aprob': ['2000-01-01', '2000-01-01', '2999-01-01', None, '2000-01-01', '2000-01-01'],
+    'Data_exp': ['2999-01-01', '2001-01-01', '2999-01-01', '2999-01-01', None, '2000-01-01'],
+    'Revizie': ['2000-01-01', '2999-01-01', None, '2000-01-01', '2000-01-01', '2000-01-01']
+})
+
+def layers(*names):
+    """Every column in its own one-column layer, named after it."""
+    return {name: gpd.GeoDataFrame({name: COLUMNS[name]}) for name in names}
+
+def run(handler, rule, **inputs):
+    """Runs a rule of category 4 and returns its status and what it reported."""
+    return run_rule(CategoryFour(1, '', None), handler, rule, **inputs)
+
+def expected(fails):
+    return ('Fail', fails) if fails else ('Pass', '-')
+
+def is_missing(value):
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+# The loops the rules ran before they were rewritten, what the report has to keep matching
+
+def old_rule_14(zip_path, value):
+    pdf_fail = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        with zipfile.ZipFile(zip_path, 'r') as zip_archive:
+            pdf_files = [pdf for pdf in zip_archive.namelist() if pdf.lower().endswith('.pdf')]
+            zip_archive.extractall(temp_dir, members=pdf_files)
+
+            for pdf_file in pdf_files:
+                kind = filetype.guess(os.path.join(temp_dir, pdf_file))
+                if kind is None or kind.extension != value:
+                    pdf_fail.append(pdf_file)
+    return '\n'.join(pdf.split('/')[-1] for pdf in pdf_fail)
+
+def old_rule_21(gdf, layer, columns):
+    columns_null = {}
+    for column in columns:
+        col_data = gdf[layer][column]
+        null_indices = [i + 1 for i, value in enumerate(col_data) if value in [None, "", "NULL"] or is_missing(value)]
+
+        if column in ["POT", "CUT", "CLAD"] and len(null_indices) == len(col_data):
+            columns_null[column] = "Nu contine date!"
+        elif null_indices and column not in ["POT", "CUT", "CLAD"]:
+            columns_null[column] = null_indices
+    return columns_null
+
+def old_rule_25(layer, h1_list, h2_list, h3_list):
+    index_fail = set()
+    for i in range(len(layer)):
+        hilucs_1, hilucs_2, hilucs_3 = layer['H1'][i], layer['H2'][i], layer['H3'][i]
+
+        h1_class = re.sub(r'[^\d_]', '', hilucs_1) if hilucs_1 is not None else ""
+        h2_class = re.sub(r'[^\d_]', '', hilucs_2) if hilucs_2 is not None else ""
+
+        if hilucs_1 not in h1_list:
+            index_fail.add(i + 1)
+        if hilucs_2 is not None and (h1_class not in hilucs_2 or hilucs_2 not in h2_list):
+            index_fail.add(i + 1)
+        if hilucs_3 is not None and (h2_class not in hilucs_3 or hilucs_3 not in h3_list):
+            index_fail.add(i + 1)
+    return index_fail
+
+def old_join(column, reference, found):
+    cods = reference.to_list()
+    return [i + 1 for i, value in enumerate(column.to_list()) if (value in cods) == found]
+
+def old_rule_37(values):
+    seen, index_fail = [], []
+    for i, code in enumerate(values):
+        if code in seen:
+            index_fail.append(i + 1)
+        else:
+            seen.append(code)
+    return index_fail
+
+def old_rule_40(column):
+    value_list = column.to_list()
+    unique_values = list(set(value_list))
+    if len(unique_values) == 1:
+        return []
+    values = {value: value_list.count(value) for value in unique_values}
+    max_value = max(values.values())
+    ids_to_get = [key for key, value in values.items() if value != max_value]
+    return [i + 1 for i in range(len(column)) if column[i] in ids_to_get]
+
+def old_rule_29(column_data):
+    return [i + 1 for i, geom in enumerate(column_data) if geom is None or geom == "" or (isinstance(geom, float) and np.isnan(geom))]
+
+def old_rule_31(column_data):
+    return [i + 1 for i in range(len(column_data)) if not column_data.iloc[i].is_valid]
+
+def old_rule_36(column_data):
+    return [
+        i + 1 for i, geom in enumerate(column_data.dropna())
+        if geom.area < 1e-6 and (geom.length / geom.area if geom.area > 0 else float('inf')) > 10
+    ]
+
+def old_rule_41(column_data):
+    return [i + 1 for i, geom in enumerate(column_data) if geom is not None and geom.has_z]
+
+def old_rule_42(column_data, geometry_data, unit):
+    index_fail = []
+    for i in range(len(geometry_data)):
+        value = round(geometry_data[i].area, 2) / 10000 if unit == 'ha' else round(geometry_data[i].area, 2)
+        if not float(f'{abs(value - float(column_data[i])):.2f}') <= 0.1:
+            index_fail.append(i + 1)
+    return index_fail
+
+def old_rule_43(column_data, geometry_data):
+    index_fail = []
+    for i in range(len(geometry_data)):
+        value = round(geometry_data[i].length, 2)
+        if not float(f'{abs(value - float(column_data[i])):.2f}') <= 0.1:
+            index_fail.append(i + 1)
+    return index_fail
+
+def old_rule_44(column_data_1, column_data_2):
+    area_1 = 0
+    area_2 = 0
+    for value in column_data_1:
+        area_1 += value
+    for value in column_data_2:
+        area_2 += value
+    return float(f'{abs(area_1 - area_2):.2f}') <= 0.1
+
+def old_rule_35(column_data):
+    overlap_pairs, unique_pairs, filtered_pairs = [], set(), []
+    sindex = column_data.sindex
+    for i, geom in enumerate(column_data):
+        for j in list(sindex.intersection(geom.bounds)):
+            if i != j and geom.overlaps(column_data.iloc[j]):
+                overlap_pairs.append((int(i + 1), int(j + 1)))
+    for pair in overlap_pairs:
+        if tuple(sorted(pair)) not in unique_pairs:
+            filtered_pairs.append(pair)
+            unique_pairs.add(tuple(sorted(pair)))
+    return filtered_pairs
+
+def old_rule_32(layer, uat_db):
+    if uat_db is None:
+        return False
+    gdf_boundary = layer['geometry'].boundary.set_crs(layer.crs)
+    uat_db_boundary = uat_db.boundary.set_crs(layer.crs)
+    # geopandas aligned the rows on their index, with a warning when they differ
+    return gdf_boundary.within(uat_db_boundary.buffer(10), align=True).all()
+
+def old_rule_33(geom_tfi, geom_tbi):
+    return [i + 1 for i, geom in enumerate(geom_tfi) if not geom.within(geom_tbi.buffer(0.1))]
+
+def old_rule_34(column_data, geom):
+    return geom.area - 50 <= column_data.union_all().area
+
+def old_rule_39(cod_column, tip_column, zfzrs):
+    index_fail = []
+    romanian_map = {'\u015F': '\u0219', '\u0163': '\u021B'}
+    for i in range(len(cod_column)):
+        tip_zf_zrs = tip_column[i]
+        row = np.where(zfzrs['definitie'] == cod_column[i])[0][0]
+        to_check = zfzrs['definite_lung'][row].strip()
+        for old_char, new_char in romanian_map.items():
+            tip_zf_zrs = tip_zf_zrs.replace(old_char, new_char)
+            element_check = to_check.replace(old_char, new_char)
+        if tip_zf_zrs.strip() != element_check:
+            index_fail.append(i + 1)
+    return index_fail
+
+def old_rule_46(layer_1, layer_2, zona_tip):
+    index_fail = []
+    romanian_map = {'\u015F': '\u0219', '\u0163': '\u021B'}
+    for i in range(len(layer_1['Tip'])):
+        if layer_1['Cod'][i] in layer_2['Cod'].to_list():
+            if layer_1['Tip'][i].strip() not in [element.strip() for element in layer_2['Tip']]:
+                index_fail.append(i + 1)
+            for old_char, new_char in romanian_map.items():
+                zona_tip_element = zona_tip.replace(old_char, new_char).strip()
+                zona_element = layer_1['Zona'][i].replace(old_char, new_char).strip()
+            if zona_tip_element != zona_element:
+                index_fail.append(i + 1)
+    return index_fail
+
+def old_rule_24(layer, columns):
+    current_date = datetime.now()
+    if "Data_aprob" in columns and "Data_exp" in columns:
+        return [i + 1 for i in range(len(layer['Data_aprob'])) if not (layer['Data_aprob'][i] <= current_date <= layer['Data_exp'][i])]
+    column = columns[0]
+    return [i + 1 for i in range(len(layer[column])) if not (current_date >= layer[column][i])]
+
+def old_rule_22(layer, columns_dtypes):
+    # The loop wrote the parsed dates back into the layer, it runs on a copy
+    layer = layer.copy()
+    rule_value, columns_wd = [], []
+    for column_dtype in columns_dtypes:
+        column, dtype = column_dtype.split('-')
+        if layer[column].dtype == dtype:
+            rule_value.append(True)
+        elif layer[column].dtype == 'O':
+            layer[column] = pd.to_datetime(layer[column], errors='coerce').astype('datetime64[ms]')
+            if layer[column].dtype == dtype:
+                rule_value.append(True)
+            else:
+                rule_value.append(False)
+                columns_wd += [column, dtype, layer[column].dtype]
+    return columns_wd if False in rule_value else []
+
+def old_rule_23(values, codes=None, pattern=None, strip=True):
+    if codes is not None:
+        return [i + 1 for i, value in enumerate(values) if not is_missing(value) and not value in codes]
+    text = (str(value).strip() if strip else str(value) for value in values)
+    return [i + 1 for i, (value, value_text) in enumerate(zip(values, text)) if not is_missing(value) and not re.match(pattern, value_text)]
+
+@pytest.mark.parametrize('workers', [0, 4])
+@pytest.mark.parametrize('value', ['pdf', 'png'])
+def test_rule_14_matches_the_extraction(tmp_path, workers, value):
+    zip_path = write_archive(tmp_path / 'arhiva.zip', members={
+        'PUG_X/2_Piese/memoriu.pdf': PDF,
+        'PUG_X/2_Piese/PLAN.PDF': PDF,
+        'PUG_X/2_Piese/mare.pdf': PDF * 50,
+        'PUG_X/2_Piese/fals.pdf': b'not a pdf at all',
+        'PUG_X/2_Piese/gol.pdf': b'',
+        'PUG_X/4_Avize/imagine.pdf': PNG,
+        'PUG_X/4_Avize/imagine.png': PNG
+    })
+
+    with ArchiveIndex(zip_path, workers=workers) as archive:
+        category = CategoryThree(1, zip_path, archive)
+        assert run_rule(category, CategoryThree.rule_14, make_rule(value=value)) == expected(old_rule_14(zip_path, value))
+
+def test_rule_14_without_pdfs(tmp_path):
+    zip_path = write_archive(tmp_path / 'arhiva.zip', members={'PUG_X/': b''})
+
+    with ArchiveIndex(zip_path) as archive:
+        assert run_rule(CategoryThree(1, zip_path, archive), CategoryThree.rule_14, make_rule(value='pdf')) == ('Pass', '-')
+
+@pytest.mark.parametrize('column', ['Cod', 'POT'])
+@pytest.mark.parametrize('name', list(COLUMNS))
+def test_rule_21_matches_the_loop(name, column):
+    gdf = {'UTR': gpd.GeoDataFrame({column: COLUMNS[name]})}
+    assert run(CategoryFour.rule_21, make_rule('UTR', column), gdf=gdf) == expected(old_rule_21(gdf, 'UTR', [column]))
+
+def test_rule_21_reports_every_column():
+    gdf = {'UTR': gpd.GeoDataFrame({
+        'Cod': ['A', None, ''],
+        'Tip': ['x', 'y', 'z'],
+        'CUT': [None, np.nan, 'NULL'],
+        'POT': [None, 1.5, None],
+        'CLAD': [np.nan, np.nan, np.nan]
+    })}
+    rule = make_rule('UTR', 'Cod,Tip,CUT,POT,CLAD')
+
+    assert old_rule_21(gdf, 'UTR', ['Cod', 'Tip', 'CUT', 'POT', 'CLAD']) == {'Cod': [2, 3], 'CUT': 'Nu contine date!', 'CLAD': 'Nu contine date!'}
+    assert run(CategoryFour.rule_21, rule, gdf=gdf) == expected(old_rule_21(gdf, 'UTR', ['Cod', 'Tip', 'CUT', 'POT', 'CLAD']))
+
+@pytest.mark.parametrize('check', ['check_cod', 'check_h1', 'check_h2', 'check_h3'])
+@pytest.mark.parametrize('name', list(COLUMNS))
+def test_rule_23_codes_match_the_loop(name, check):
+    gdf = layers(name)
+    vocabularies = Vocabularies(CODES, CODES, CODES, CODES)
+    rule = make_rule(name, f'{name}-{check}')
+
+    index_fail = old_rule_23(COLUMNS[name], codes=CODES['definitie'].to_list())
+    assert run(CategoryFour.rule_23, rule, gdf=gdf, vocabularies=vocabularies) == \
+        expected({name: index_fail} if index_fail else [])
+
+@pytest.mark.parametrize('check, pattern, strip', [
+    ('Date', DATE_PATTERN, True),
+    ('Date_2', DATE_2_PATTERN, True),
+    ('Zecimale', DECIMALS_PATTERN, False),
+    ('HCL', HCL_PATTERN, False)
+])
+@pytest.mark.parametrize('name', list(COLUMNS))
+def test_rule_23_formats_match_the_loop(name, check, pattern, strip):
+    gdf = layers(name)
+    vocabularies = Vocabularies(CODES, CODES, CODES, CODES)
+    rule = make_rule(name, f'{name}-{check}')
+
+    index_fail = old_rule_23(COLUMNS[name], pattern=pattern, strip=strip)
+    assert run(CategoryFour.rule_23, rule, gdf=gdf, vocabularies=vocabularies) == \
+        expected({name: index_fail} if index_fail else [])
+
+@pytest.mark.parametrize('regex', [r'^4_aviz\d+\.pdf$', r'4_', r'^aviz'])
+def test_rule_13_matches_the_loop(archive_path, regex):
+    with ArchiveIndex(archive_path) as archive:
+        avize_failed = [aviz for aviz in archive.avize_list if not re.match(regex, aviz)]
+        assert run_rule(CategoryTwo(1, archive_path, archive), CategoryTwo.rule_13, make_rule(value=regex)) == expected(avize_failed)
+
+@pytest.mark.parametrize('regex', [r'^PUG_\w+$', r'^PUZ_\w+$'])
+def test_rule_4_matches_the_loop(archive_path, regex):
+    with ArchiveIndex(archive_path) as archive:
+        main_dir = archive.main_directory
+        assert run_rule(CategoryTwo(1, archive_path, archive), CategoryTwo.rule_4, make_rule(value=regex)) == \
+            expected(main_dir if not re.match(regex, main_dir[0]) else None)
+
+@pytest.mark.parametrize('regex', [r'^PUG_\d+\.gpkg$', r'^PUG_[A-Z]+\.gpkg$'])
+def test_rule_9_matches_the_loop(archive_path, regex):
+    with ArchiveIndex(archive_path) as archive:
+        assert run_rule(CategoryTwo(1, archive_path, archive), CategoryTwo.rule_9, make_rule(value=regex)) == \
+            expected('PUG_123.gpkg' if not re.match(regex, 'PUG_123.gpkg') else None)
+
+@pytest.mark.parametrize('rows', [slice(None), slice(0, 3), slice(0, 0)])
+def test_rule_25_matches_the_loop(rows):
+    layer = HILUCS_LAYER[rows].reset_index(drop=True)
+    h1_list, h2_list, h3_list = (list(codes) for codes in (HILUCS.hilucs1, HILUCS.hilucs2, HILUCS.hilucs3))
+
+    index_fail = old_rule_25(layer, h1_list, h2_list, h3_list)
+    assert run(CategoryFour.rule_25, make_rule('UTR', 'H1,H2,H3'), gdf={'UTR': layer}, vocabularies=HILUCS) == expected(index_fail)
+
+@pytest.mark.parametrize('reference', list(COLUMNS))
+@pytest.mark.parametrize('name', list(COLUMNS))
+def test_joins_match_the_loop(name, reference):
+    gdf = {**layers(name), 'reference': gpd.GeoDataFrame({'reference': COLUMNS[reference]})}
+
+    index_fail = old_join(COLUMNS[name], COLUMNS[reference], found=False)
+    assert run(CategoryFour.rule_26, make_rule('reference:reference', f'{name}:{name}'), gdf=gdf) == \
+        expected({name: index_fail} if index_fail else [])
+
+    index_fail = old_join(COLUMNS[name], COLUMNS[reference], found=True)
+    assert run(CategoryFour.rule_38, make_rule('reference:reference', f'{name}:{name}'), gdf=gdf) == \
+        expected({name: index_fail} if index_fail else [])
+
+@pytest.mark.parametrize('name', list(COLUMNS))
+def test_rule_37_matches_the_loop(name):
+    assert run(CategoryFour.rule_37, make_rule(name, name), gdf=layers(name)) == expected(old_rule_37(COLUMNS[name]))
+
+@pytest.mark.parametrize('name', list(COLUMNS))
+def test_rule_40_matches_the_loop(name):
+    gdf = layers(name)
+    result = run(CategoryFour.rule_40, make_rule(name, name), gdf=gdf)
+
+    if COLUMNS[name].empty:
+        # The loop reported the max() error of an empty sequence, an empty layer passes now
+        assert result == ('Pass', '-')
+    else:
+        assert result == expected(old_rule_40(COLUMNS[name]))
+
+@pytest.mark.parametrize('layer', ['all', 'not_null', 'empty'])
+@pytest.mark.parametrize('handler, old_rule', [
+    (CategoryFour.rule_29, old_rule_29),
+    (CategoryFour.rule_36, old_rule_36),
+    (CategoryFour.rule_41, old_rule_41)
+])
+def test_geometry_predicates_match_the_loop(handler, old_rule, layer):
+    gdf = geometry_layers()
+    assert run(handler, make_rule(layer), gdf=gdf) == expected(old_rule(gdf[layer]['geometry']))
+
+@pytest.mark.parametrize('layer', ['not_null', 'empty'])
+def test_rule_31_matches_the_loop(layer):
+    gdf = geometry_layers()
+    assert run(CategoryFour.rule_31, make_rule(layer), gdf=gdf) == expected(old_rule_31(gdf[layer]['geometry']))
+
+def test_rule_31_leaves_the_null_geometries_to_rule_29():
+    # The loop reported the error of calling is_valid on None, the other rows are checked now
+    gdf = geometry_layers()
+    not_null = [i + 1 for i, geom in enumerate(GEOMETRIES) if geom is not None]
+
+    assert run(CategoryFour.rule_31, make_rule('all'), gdf=gdf) == \
+        expected([not_null[i - 1] for i in old_rule_31(gdf['not_null']['geometry'])])
+
+# The areas and lengths measured on the layers, and the ones the attributes give for them
+MEASURES = [
+    ('m', [100, 100.1, 100.11, 99.89, '100', np.nan, 0], [box(0, 0, 10, 10)] * 6 + [Polygon()]),
+    ('ha', [0.01, 0.11, 0.12, 0.0, 1.0], [box(0, 0, 10, 10), box(0, 0, 10, 10), box(0, 0, 10, 10), Point(0, 0), box(0, 0, 100, 100)]),
+    ('m', [], [])
+]
+
+@pytest.mark.parametrize('unit, values, geometries', MEASURES)
+def test_rule_42_matches_the_loop(unit, values, geometries):
+    layer = gpd.GeoDataFrame({'Suprafata': pd.Series(values, dtype=object)}, geometry=geometries)
+
+    index_fail = old_rule_42(layer['Suprafata'], layer['geometry'], unit)
+    assert run(CategoryFour.rule_42, make_rule(f'UTR-{unit}', 'Suprafata'), gdf={'UTR': layer}) == expected(index_fail)
+
+@pytest.mark.parametrize('values', [[10, 10.1, 10.11, '9.9', np.nan, 0], []])
+def test_rule_43_matches_the_loop(values):
+    geometries = [LineString([(0, 0), (10, 0)])] * (len(values) - 1) + [LineString()] * bool(values)
+    layer = gpd.GeoDataFrame({'Lungime': pd.Series(values, dtype=object)}, geometry=geometries)
+
+    index_fail = old_rule_43(layer['Lungime'], layer['geometry'])
+    assert run(CategoryFour.rule_43, make_rule('Linii', 'Lungime'), gdf={'Linii': layer}) == expected(index_fail)
+
+@pytest.mark.parametrize('handler, formula', [(CategoryFour.rule_42, 'UTR-m'), (CategoryFour.rule_43, 'UTR')])
+def test_rules_42_and_43_report_missing_geometries(handler, formula):
+    layer = gpd.GeoDataFrame({'Suprafata': [100.0, 100.0, 100.0]}, geometry=[box(0, 0, 10, 10), None, None])
+
+    assert run(handler, make_rule(formula, 'Suprafata'), gdf={'UTR': layer}) == ('Error', 'Missing geometries on rows [2, 3]')
+
+@pytest.mark.parametrize('values_1, values_2', [
+    ([1.0, 2.0], [3.0]),
+    ([1.0, 2.0], [3.1]),
+    ([1.0, 2.0], [3.11]),
+    ([1.0, np.nan], [1.0]),
+    ([], []),
+    ([], [0.2])
+])
+def test_rule_44_matches_the_loop(values_1, values_2):
+    gdf = {'UTR': pd.DataFrame({'Suprafata': pd.Series(values_1, dtype=float)}), 'PlanSpatial': pd.DataFrame({'Suprafata': pd.Series(values_2, dtype=float)})}
+
+    status = 'Pass' if old_rule_44(gdf['UTR']['Suprafata'], gdf['PlanSpatial']['Suprafata']) else 'Fail'
+    assert run(CategoryFour.rule_44, make_rule('UTR-Suprafata', 'PlanSpatial-Suprafata'), gdf=gdf) == (status, '-')
+
+def overlapping_boxes(count, seed):
+    """Boxes scattered so that some of them overlap, touch or contain each other."""
+    rng = np.random.default_rng(seed)
+    corners = rng.integers(0, 20, size=(count, 2))
+    sizes = rng.integers(1, 6, size=(count, 2))
+    return [box(x, y, x + width, y + height) for (x, y), (width, height) in zip(corners, sizes)]
+
+@pytest.mark.parametrize('geometries', [
+    overlapping_boxes(60, seed=1),
+    overlapping_boxes(200, seed=2),
+    [box(0, 0, 10, 10), box(10, 0, 20, 10), box(2, 2, 4, 4), box(5, 5, 15, 15)],
+    []
+])
+def test_rule_35_matches_the_loop(geometries):
+    layer = gpd.GeoDataFrame(geometry=geometries)
+    assert run(CategoryFour.rule_35, make_rule('UTR'), gdf={'UTR': layer}) == expected(old_rule_35(layer['geometry']))
+
+class FakeAPIClient:
+    """Gives the boundary of the UAT every test sets, without asking the server."""
+
+    uat = None
+
+    def __init__(self, config, auth):
+        pass
+
+    def get_geodata(self, siruta):
+        return FakeAPIClient.uat
+
+@pytest.mark.parametrize('geometries, uat', [
+    ([box(0, 0, 100, 100)], [box(0, 0, 100, 100)]),
+    ([box(0, 0, 100, 105)], [box(0, 0, 100, 100)]),
+    ([box(0, 0, 100, 120)], [box(0, 0, 100, 100)]),
+    ([box(0, 0, 100, 100), box(0, 0, 100, 100)], [box(0, 0, 100, 100)]),
+    ([box(0, 0, 100, 100), box(0, 0, 50, 50)], [box(0, 0, 100, 100), box(0, 0, 50, 50)]),
+    ([box(0, 0, 100, 100)], None)
+])
+def test_rule_32_matches_geopandas(monkeypatch, geometries, uat):
+    monkeypatch.setattr(rules, 'APIClient', FakeAPIClient)
+    monkeypatch.setattr(rules, 'ConfigManager', lambda: None)
+    monkeypatch.setattr(rules, 'AuthManager', lambda config: None)
+    monkeypatch.setattr(FakeAPIClient, 'uat', None if uat is None else gpd.GeoSeries(uat))
+    layer = gpd.GeoDataFrame({'Siruta': ['12345'] * len(geometries)}, geometry=geometries, crs='EPSG:3844')
+
+    status = 'Pass' if old_rule_32(layer, FakeAPIClient.uat) else 'Fail'
+    assert run(CategoryFour.rule_32, make_rule('PlanSpatial', 'Siruta'), gdf={'PlanSpatial': layer}) == (status, '-')
+
+@pytest.mark.parametrize('geometries', [
+    [box(0, 0, 10, 10), box(10, 0, 20, 10)],
+    [box(0, 0, 10, 10), box(90, 90, 100.05, 100.05), box(90, 90, 100.2, 100)],
+    [box(200, 200, 210, 210)],
+    []
+])
+def test_rule_33_matches_the_loop(geometries):
+    gdf = {
+        'UTR': gpd.GeoDataFrame(geometry=geometries),
+        'PlanSpatial': gpd.GeoDataFrame(geometry=[box(0, 0, 100, 100)])
+    }
+
+    status = 'Fail' if old_rule_33(gdf['UTR']['geometry'], gdf['PlanSpatial']['geometry'][0]) else 'Pass'
+    assert run(CategoryFour.rule_33, make_rule('UTR', 'PlanSpatial'), gdf=gdf) == (status, '-')
+
+def test_rule_33_reports_missing_geometries():
+    gdf = {
+        'UTR': gpd.GeoDataFrame(geometry=[None, box(0, 0, 10, 10), None]),
+        'PlanSpatial': gpd.GeoDataFrame(geometry=[box(0, 0, 100, 100)])
+    }
+
+    assert run(CategoryFour.rule_33, make_rule('UTR', 'PlanSpatial'), gdf=gdf) == ('Error', 'Missing geometries on rows [1, 3]')
+
+@pytest.mark.parametrize('geometries', [
+    [box(x, 0, x + 10, 10) for x in range(0, 100, 10)],
+    [box(x, 0, x + 10, 10) for x in range(0, 100, 10) if x != 50],
+    [box(0, 0, 60, 10), box(40, 0, 100, 10), box(0, 0, 95, 9.5)],
+    [box(0, 0, 100, 10), None],
+    []
+])
+def test_rule_34_matches_the_unary_union(geometries):
+    gdf = {'UTR': gpd.GeoDataFrame(geometry=geometries), 'PlanSpatial': gpd.GeoDataFrame(geometry=[box(0, 0, 100, 10)])}
+
+    status = 'Pass' if old_rule_34(gdf['UTR']['geometry'], gdf['PlanSpatial']['geometry'][0]) else 'Fail'
+    assert run(CategoryFour.rule_34, make_rule('UTR', 'PlanSpatial'), gdf=gdf, unions=UnionCache(gdf)) == (status, '-')
+
+@pytest.mark.parametrize('rows', [
+    [('ZF1', 'Zona unu'), ('ZF2', 'Zona \u021B'), ('ZF2', ' Zona \u0163 '), ('ZF1', 'Alta'), ('ZF2', 'Zona t')],
+    []
+])
+def test_rule_39_matches_the_loop(rows):
+    layer = pd.DataFrame(rows, columns=['ZFZRS', 'Tip'], dtype=object)
+
+    index_fail = old_rule_39(layer['ZFZRS'], layer['Tip'], ZFZRS)
+    assert run(CategoryFour.rule_39, make_rule('UTR', 'ZFZRS,Tip'), gdf={'UTR': layer}, zfzrs=ZFZRS) == expected(index_fail)
+
+def test_rule_39_normalizes_both_letters():
+    # The loop only replaced the t with a cedilla in the names of the list and failed the s, a missing code was an error
+    layer = pd.DataFrame([('ZF3', 'Zona \u0219'), ('ZF9', 'Zona unu'), ('ZF1', 'Zona unu')], columns=['ZFZRS', 'Tip'])
+
+    assert run(CategoryFour.rule_39, make_rule('UTR', 'ZFZRS,Tip'), gdf={'UTR': layer}, zfzrs=ZFZRS) == ('Fail', [2])
+
+@pytest.mark.parametrize('rows', [
+    [('A1', 'Zona doi', 'Zon\u0103 \u021B'), ('A2', ' Zona x ', 'Zon\u0103 \u0163'), ('Q', 'Alta', 'x'), ('A1', 'Zona y', 'Alta'), ('A3', 'Zona doi', 'Alta ')],
+    [('Q', 'Alta', 'x')],
+    []
+])
+def test_rule_46_matches_the_loop(rows):
+    gdf = {'UTR': pd.DataFrame(rows, columns=['Cod', 'Tip', 'Zona'], dtype=object), 'Ref': REFERENCE}
+
+    index_fail = old_rule_46(gdf['UTR'], gdf['Ref'], 'Zon\u0103 \u021B')
+    assert run(CategoryFour.rule_46, make_rule('UTR-Cod,Tip,Zona', 'Ref-Cod,Tip,Zon\u0103 \u021B'), gdf=gdf) == expected(index_fail)
+
+def test_rule_46_checks_the_types_of_the_same_code():
+    # The loop accepted a type given to any code and only replaced the t with a cedilla in the zones
+    rows = [('A1', 'Zona x', 'Zon\u0103 \u0219'), ('A2', 'Zona x', 'Zon\u0103 \u015F'), ('A2', 'Zona doi', 'Zon\u0103 \u0219')]
+    gdf = {'UTR': pd.DataFrame(rows, columns=['Cod', 'Tip', 'Zona']), 'Ref': REFERENCE}
+
+    assert run(CategoryFour.rule_46, make_rule('UTR-Cod,Tip,Zona', 'Ref-Cod,Tip,Zon\u0103 \u015F'), gdf=gdf) == ('Fail', [1, 3])
+
+@pytest.mark.parametrize('rows', [slice(None), slice(0, 1), slice(0, 0)])
+@pytest.mark.parametrize('columns', ['Data_aprob,Data_exp', 'Data_exp', 'Revizie'])
+def test_rule_24_matches_the_loop(columns, rows):
+    layer = VALIDITY[rows].reset_index(drop=True).astype('datetime64[ms]')
+    gdf = {'PlanSpatial': layer}
+
+    index_fail = old_rule_24(layer, columns.split(','))
+    assert run(CategoryFour.rule_24, make_rule('PlanSpatial', columns), gdf=gdf, column_cache=ColumnCache(gdf)) == expected(index_fail)
+
+@pytest.mark.parametrize('columns', ['Data_aprob,Data_exp', 'Data_exp', 'Revizie'])
+def test_rule_24_parses_text_dates(columns):
+    # The loop compared the text with a datetime and reported the TypeError
+    gdf = {'PlanSpatial': VALIDITY}
+
+    index_fail = old_rule_24(VALIDITY.astype('datetime64[ms]'), columns.split(','))
+    assert run(CategoryFour.rule_24, make_rule('PlanSpatial', columns), gdf=gdf, column_cache=ColumnCache(gdf)) == expected(index_fail)
+
+def test_rule_24_without_a_date_check():
+    gdf = {'PlanSpatial': VALIDITY}
+
+    assert run(CategoryFour.rule_24, make_rule('PlanSpatial', 'Data_aprob'), gdf=gdf, column_cache=ColumnCache(gdf)) == \
+        ('Error', 'No date check for the columns Data_aprob')
+
+# pd.to_datetime warns that it parses the mixed text of the loop one value at a time
+@pytest.mark.filterwarnings('ignore:Could not infer format')
+@pytest.mark.parametrize('columns_dtypes', [
+    'dates_text-datetime64[ms],text-object',
+    'text-int64,floats-float64',
+    'floats-int64,dates-datetime64[ms]',
+    'mixed-datetime64[ms],ints-int64'
+])
+def test_rule_22_matches_the_loop(columns_dtypes):
+    layer = pd.DataFrame({name: COLUMNS[name][:4].reset_index(drop=True) for name in ['text', 'dates_text', 'dates', 'floats', 'ints', 'mixed']})
+    gdf = {'UTR': layer.copy()}
+
+    index_fail = old_rule_22(layer, columns_dtypes.split(','))
+    assert run(CategoryFour.rule_22, make_rule('UTR', columns_dtypes), gdf=gdf, column_cache=ColumnCache(gdf)) == expected(index_fail)
+    # The columns are only converted in the cache, the other rules read the layer as it was read
+    pd.testing.assert_frame_equal(gdf['UTR'], layer)
@@ -0,0 +1,126 @@
+import pytest
+
+from extras import validation
+from extras.archive import ArchiveIndex
+from extras.rules import CategoryOne, CategoryTwo, CategoryThree, CategoryFour
+from extras.validation import RULE_REGISTRY, Validation
+from support import make_metadata, make_vocabularies, read_report
+
+CATEGORIES = {1: CategoryOne, 2: CategoryTwo, 3: CategoryThree, 4: CategoryFour}
+
+# The rules the report is checked on, listed by category in the order the metadata gives them
+RULES = [
+    (3, 14, '', 'pdf'),
+    (4, 37, 'UTR', 'Cod'),
+    (4, 16, '', '2'),
+    (2, 5, '', '3'),
+    (4, 99, '', ''),
+    (1, 1, '', ''),
+    (2, 16, '', '1'),
+    (3, 15, '', 'gpkg'),
+    (4, 26, 'UTR:Cod', 'Ref:Cod'),
+    (2, 3, '', '1'),
+    (4, 17, '', 'Linii')
+]
+
+# The rows the if-chains reported for the rules: the categories in the order they first appear, their rules by number,
+# unknown rule types and rules listed under another category are skipped
+REPORT = [
+    ['1', 'Fail', 'Blocker', '', '', '', 'fals.pdf'],
+    ['8', 'Pass', 'Blocker', '', '', '-', '-'],
+    ['2', 'Fail', 'Blocker', '', '', '', '[3]'],
+    ['3', 'Pass', 'Blocker', '', '', '-', '-'],
+    ['9', 'Fail', 'Blocker', '', '', '', "{'Cod': [2]}"],
+    ['11', 'Fail', 'Blocker', '', '', '', '-'],
+    ['4', 'Pass', 'Blocker', '', '', '-', '-'],
+    ['10', 'Pass', 'Blocker', '', '', '-', '-'],
+    ['6', 'Pass', 'Blocker', '', '', '-', '-']
+]
+
+def make_validation(archive_path, rules=RULES, validation_type=1, **kwargs):
+    return Validation(validation_type, archive_path, make_metadata(rules), *make_vocabularies(), **kwargs)
+
+@pytest.mark.parametrize('rule_type', list(RULE_REGISTRY))
+def test_registry_dispatches_to_the_rule_of_its_category(rule_type):
+    spec = RULE_REGISTRY[rule_type]
+
+    assert spec.handler is getattr(CATEGORIES[spec.category], f'rule_{rule_type}')
+    assert set(spec.inputs) <= {'gdf', 'vocabularies', 'zfzrs', 'unions', 'column_cache'}
+
+def test_registry_covers_every_rule():
+    assert sorted(RULE_REGISTRY) == list(range(1, 47))
+
+def test_schedule_orders_the_rules_as_the_report(archive_path):
+    tasks = make_validation(archive_path).schedule()
+
+    assert [rule_dict['numar_regula'] for _, rule_dict in tasks] == [int(row[0]) for row in REPORT]
+    assert all(spec is RULE_REGISTRY[rule_dict['tip_regula_id']] for spec, rule_dict in tasks)
+
+def test_schedule_skips_the_rules_of_another_validation_type(archive_path):
+    assert make_validation(archive_path, validation_type=2).schedule() == []
+
+def test_validate_reports_every_rule_in_order(archive_path):
+    assert make_validation(archive_path).validate() is False
+    assert read_report() == REPORT
+
+def test_validate_passes_when_only_warnings_fail(archive_path):
+    metadata = make_metadata([(1, 1, '', ''), (4, 17, '', 'Linii')])
+    metadata['tip_alerta_id'] = 2
+
+    assert Validation(1, archive_path, metadata, *make_vocabularies()).validate() is True
+    assert [row[1] for row in read_report()] == ['Pass', 'Fail']
+
+@pytest.mark.parametrize('kwargs', [
+    {'evict_layers': True},
+    {'max_workers': 4},
+    {'max_workers': 4, 'evict_layers': True},
+    {'max_workers': 4, 'use_processes': True, 'evict_layers': True}
+])
+def test_pools_report_the_rows_of_the_sequential_run(archive_path, kwargs):
+    assert make_validation(archive_path, **kwargs).validate() is False
+    assert read_report() == REPORT
+
+def test_rule_whose_task_raised_is_reported(archive_path, monkeypatch):
+    run_rule = validation.run_rule
+
+    def crashing_run_rule(handler, *args):
+        if handler is CategoryFour.rule_37:
+            raise RuntimeError('worker crashed')
+        return run_rule(handler, *args)
+
+    monkeypatch.setattr(validation, 'run_rule', crashing_run_rule)
+
+    assert make_validation(archive_path, max_workers=2).validate() is False
+    assert read_report() == [REPORT[0], REPORT[1], ['2', 'Error', 'Blocker', '', '', '', 'worker crashed'], *REPORT[3:]]
+
+def test_process_inputs_keep_the_columns_the_rule_reads(archive_path):
+    with ArchiveIndex(archive_path) as archive:
+        gdf = Validation.extract_data(archive, {})
+        inputs = Validation.process_inputs({'gdf': gdf, 'zfzrs': None}, {'UTR': {'Cod'}})
+
+        assert list(inputs['gdf']) == ['UTR']
+        assert list(inputs['gdf']['UTR'].columns) == ['Cod']
+        assert inputs['zfzrs'] is None
+
+def test_projection_merges_the_columns_of_every_rule(archive_path):
+    tasks = make_validation(archive_path, rules=[
+        (4, 37, 'UTR', 'Cod'),
+        (4, 26, 'UTR:Tip', 'Ref:Cod'),
+        (4, 29, 'Linii', ''),
+        (4, 19, 'Ref', 'Cod'),
+        (4, 21, 'UTR', None),
+        (4, 16, '', '2')
+    ]).schedule()
+    tasks_columns = [Validation.read_columns(spec, rule_dict) for spec, rule_dict in tasks]
+
+    # A malformed rule reads nothing, a rule reading every column of a layer wins over the ones reading some
+    assert tasks_columns == [{'UTR': {'Cod'}}, {'UTR': {'Tip'}, 'Ref': {'Cod'}}, {'Linii': set()}, {'Ref': None}, {}, {}]
+    assert Validation.projection(tasks_columns) == {'UTR': {'Cod', 'Tip'}, 'Ref': None, 'Linii': set()}
+
+def test_layers_are_read_with_the_projection(archive_path):
+    with ArchiveIndex(archive_path) as archive:
+        gdf = Validation.extract_data(archive, {'UTR': {'Cod'}})
+
+        assert list(gdf) == ['UTR', 'Ref']
+        assert list(gdf['UTR'].columns) == ['Cod', 'geometry']
+        assert list(gdf['Ref'].columns) == ['Cod', 'Tip', 'geometry']